@@ -1,12 +1,39 @@
 # app/__init__.py
 # Инициализация Flask-приложения и регистрация маршрутов (routes)
 
-from flask import Flask
+import os
+import time
+from flask import Flask, request
 from flask_login import LoginManager
 # from .models import db, User  # Removed database-related imports
 from .api import api_bp
+from .metrics import registry as metrics_registry
+
+REQUESTS = metrics_registry.counter('synchrony_http_requests_total', 'HTTP requests by endpoint and status')
+
+# Загружать ли модели при старте (по умолчанию — при первом запросе)
+WARM_UP = os.environ.get('WARM_UP', '0') == '1'
+
+def warm_up():
+    """
+    Заранее импортирует тяжёлые библиотеки и загружает модели, чтобы первый запрос
+    не ждал их загрузки. Вызывается при WARM_UP=1 или вручную (например, из воркера).
+    """
+    from app.lazy import import_now
+    from app.speech_recognition import torch, transformers, preload_models
+    from app.audio_processing import librosa, sf, signal
+    from app.punctuation import get_punct_model
+    from app.utils import get_ffmpeg_pool
+
+    started = time.perf_counter()
+    import_now(torch, transformers, librosa, sf, signal)
+    get_ffmpeg_pool(16000).warm_up()
+    get_punct_model()
+    preload_models()
+    print(f"🔥 Прогрев завершён за {time.perf_counter() - started:.2f} с")
 
 def create_app(template_folder=None, static_folder=None):
+    started = time.perf_counter()
     app = Flask(__name__, template_folder=template_folder, static_folder=static_folder)
 
     from app.routes import bp
@@ -23,4 +50,19 @@ def create_app(template_folder=None, static_folder=None):
     def load_user(user_id):
         return None  # Adjusted to return None since no database is used
 
+    @app.after_request
+    def count_request(response):
+        REQUESTS.inc(endpoint=request.endpoint or 'unknown', status=response.status_code)
+        return response
+
+    # Предзагрузка моделей распознавания и перевода (PRELOAD_LANGUAGES, PRELOAD_TRANSLATION_PAIRS)
+    from app.speech_recognition import preload_models
+    from app.translation import preload_translations
+    if WARM_UP:
+        warm_up()
+    else:
+        preload_models()
+    preload_translations()
+
+    print(f"🚀 Приложение инициализировано за {time.perf_counter() - started:.2f} с")
     return app
@@ -1,26 +1,41 @@
 # app/accent_config.py
 # Конфигурация акцентов для разных языков
+# backend — движок инференса: 'eager', 'quantized' (int8), 'torchscript' или 'onnx' (нужен onnxruntime)
+# decoder — декодирование CTC: 'greedy' или 'beam' (лучевой поиск);
+# lm_path — путь к n-граммной языковой модели в формате ARPA для лучевого поиска (None — без неё)
 
 ACCENT_CONFIGS = {
     'ru': {
         'model_id': "jonatasgrosman/wav2vec2-large-xlsr-53-russian",
         'description': 'Русский акцент',
-        'sample_rate': 16000
+        'sample_rate': 16000,
+        'backend': 'eager',
+        'decoder': 'greedy',
+        'lm_path': None
     },
     'en': {
         'model_id': "facebook/wav2vec2-base-960h",
         'description': 'Английский акцент',
-        'sample_rate': 16000
+        'sample_rate': 16000,
+        'backend': 'eager',
+        'decoder': 'greedy',
+        'lm_path': None
     },
     'de': {
         'model_id': "maxidl/wav2vec2-large-xlsr-german",
         'description': 'Немецкий акцент',
-        'sample_rate': 16000
+        'sample_rate': 16000,
+        'backend': 'eager',
+        'decoder': 'greedy',
+        'lm_path': None
     },
     'fr': {
         'model_id': "facebook/wav2vec2-large-xlsr-53-french",
         'description': 'Французский акцент',
-        'sample_rate': 16000
+        'sample_rate': 16000,
+        'backend': 'eager',
+        'decoder': 'greedy',
+        'lm_path': None
     }
 }
 
@@ -1,9 +1,11 @@
 from flask import Blueprint, request, jsonify
 from flask_restful import Api, Resource
 from flask_login import login_required, current_user
-from app.speech_recognition import recognize_speech
+from app.speech_recognition import model_registry
+from app.pipeline import process_speech_to_text
+from app.worker_pool import run_inference, PoolBusy, InferenceTimeout
 from app.punctuation import punctuate_text
-from app.translation import translate_text
+from app.translation import translate_text, get_translation_cache_stats
 
 api_bp = Blueprint('api', __name__)
 api = Api(api_bp)
@@ -14,7 +16,12 @@ class SpeechToText(Resource):
         language_code = request.form.get('language', 'ru')
         if not audio_file:
             return {'error': 'No audio file provided'}, 400
-        text = recognize_speech(audio_file, language_code=language_code)
+        try:
+            text = run_inference(process_speech_to_text, audio_file.read(), language_code=language_code)
+        except PoolBusy as e:
+            return {'error': str(e)}, 503
+        except InferenceTimeout as e:
+            return {'error': str(e)}, 504
         return {'text': text}
 
 class Translate(Resource):
@@ -33,6 +40,16 @@ class History(Resource):
     def get(self):
         return jsonify([])
 
+class ModelStats(Resource):
+    def get(self):
+        return model_registry.get_stats()
+
+class TranslationCacheStats(Resource):
+    def get(self):
+        return get_translation_cache_stats()
+
 api.add_resource(SpeechToText, '/api/speech-to-text')
 api.add_resource(Translate, '/api/translate')
-api.add_resource(History, '/api/history') 
\ No newline at end of file
+api.add_resource(History, '/api/history')
+api.add_resource(ModelStats, '/api/models')
+api.add_resource(TranslationCacheStats, '/api/translation-cache') 
\ No newline at end of file
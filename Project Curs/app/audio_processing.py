@@ -1,55 +1,234 @@
 # app/audio_processing.py
 # Функции для улучшения качества аудио перед распознаванием
 
+import functools
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import librosa
-import soundfile as sf
-from scipy import signal
-
-def enhance_audio(waveform, sample_rate):
-    """
-    Мягкая обработка аудио: только trim и нормализация.
-    """
-    # Нормализация
-    waveform = librosa.util.normalize(waveform)
-    
-    # Удаление тишины в начале и конце
-    waveform, _ = librosa.effects.trim(waveform, top_db=20)
-    
-    # Финальная нормализация
-    waveform = librosa.util.normalize(waveform)
-    
+from app.lazy import lazy_import
+from app.metrics import timed
+
+# Тяжёлые библиотеки импортируются при первом использовании
+librosa = lazy_import('librosa')
+sf = lazy_import('soundfile')
+signal = lazy_import('scipy.signal')
+
+# Частота среза фильтра верхних частот в Гц (0 — фильтр выключен)
+AUDIO_HIGHPASS_HZ = float(os.environ.get('AUDIO_HIGHPASS_HZ', 0))
+# Шумоподавление спектральным гейтом (для шумных записей, например из колл-центра)
+AUDIO_NOISE_SUPPRESSION = os.environ.get('AUDIO_NOISE_SUPPRESSION', '0') == '1'
+# Порог обрезки тишины в начале и конце, дБ ниже пика
+TRIM_TOP_DB = 20
+# Параметры спектрального гейта: окно STFT, перекрытие, оценка шума и минимальное усиление
+NOISE_NPERSEG = 512
+NOISE_NOVERLAP = 384
+NOISE_PERCENTILE = 10
+NOISE_THRESHOLD = 1.5
+NOISE_FLOOR_GAIN = 0.1
+# Число потоков для пакетной обработки (NumPy и SciPy отпускают GIL)
+AUDIO_PREPROCESS_WORKERS = int(os.environ.get('AUDIO_PREPROCESS_WORKERS', 4))
+
+# Проверка наличия речи перед распознаванием (тишина и случайные нажатия не идут в модель)
+VAD_ENABLED = os.environ.get('VAD_ENABLED', '1') == '1'
+# Минимальная длительность записи, с
+VAD_MIN_DURATION_SEC = float(os.environ.get('VAD_MIN_DURATION_SEC', 0.3))
+# Порог громкости кадра, дБ относительно пика записи: тихо записанная речь
+# не отбрасывается, пока она заметно громче собственного фона
+VAD_RMS_THRESHOLD_DB = float(os.environ.get('VAD_RMS_THRESHOLD_DB', -40))
+# Пик записи ниже этого уровня (дБ относительно полной шкалы) — цифровая тишина
+VAD_SILENCE_FLOOR_DB = float(os.environ.get('VAD_SILENCE_FLOOR_DB', -80))
+# Сколько секунд кадров, похожих на речь, нужно, чтобы запись считалась речью
+VAD_MIN_VOICED_SEC = float(os.environ.get('VAD_MIN_VOICED_SEC', 0.15))
+VAD_FRAME_SEC = 0.03
+# Доля переходов через ноль в кадре речи: ниже — гул и постоянная составляющая, выше — шипение
+VAD_ZCR_RANGE = (0.01, 0.4)
+
+# Коды причин, по которым распознавание пропускается
+VAD_REASON_EMPTY = 'empty'
+VAD_REASON_TOO_SHORT = 'too_short'
+VAD_REASON_SILENCE = 'silence'
+VAD_REASON_NO_SPEECH = 'no_speech'
+
+def detect_voice_activity(waveform, sample_rate):
+    """
+    Дешёвая проверка наличия речи по декодированному сигналу: громкость (RMS)
+    относительно пика записи и частота переходов через ноль в кадрах по VAD_FRAME_SEC.
+    :return: None, если речь есть, иначе код причины (VAD_REASON_*)
+    """
+    if len(waveform) == 0:
+        return VAD_REASON_EMPTY
+    if len(waveform) < VAD_MIN_DURATION_SEC * sample_rate:
+        return VAD_REASON_TOO_SHORT
+
+    hop = max(1, int(VAD_FRAME_SEC * sample_rate))
+    n_frames = len(waveform) // hop
+    frames = waveform[:n_frames * hop].reshape(n_frames, hop)
+
+    peak = max(float(waveform.max()), -float(waveform.min()))
+    if peak <= 10 ** (VAD_SILENCE_FLOOR_DB / 20):
+        return VAD_REASON_SILENCE
+
+    power = np.einsum('ij,ij->i', frames, frames) / hop
+    loud = power > peak * peak * 10 ** (VAD_RMS_THRESHOLD_DB / 10)
+    if not loud.any():
+        return VAD_REASON_SILENCE
+
+    crossings = np.count_nonzero(np.diff(np.signbit(frames[loud]), axis=1), axis=1) / hop
+    voiced = np.count_nonzero((crossings > VAD_ZCR_RANGE[0]) & (crossings < VAD_ZCR_RANGE[1]))
+    if voiced * VAD_FRAME_SEC < VAD_MIN_VOICED_SEC:
+        return VAD_REASON_NO_SPEECH
+    return None
+
+def normalize_inplace(waveform):
+    """
+    Пиковая нормализация на месте (без временного массива abs).
+    """
+    if len(waveform) == 0:
+        return waveform
+    peak = max(float(waveform.max()), -float(waveform.min()))
+    if peak > 1e-8:
+        waveform *= 1.0 / peak
     return waveform
 
+def trim_silence(waveform, top_db=TRIM_TOP_DB, frame_length=2048, hop_length=512):
+    """
+    Обрезает тишину в начале и конце по RMS кадров (как librosa.effects.trim).
+    Энергия кадров считается через накопленную сумму квадратов за один проход.
+    :return: Срез исходного массива (без копирования)
+    """
+    n = len(waveform)
+    if n <= frame_length:
+        return waveform
+
+    energy = np.empty(n + 1, dtype=np.float64)
+    energy[0] = 0.0
+    np.square(waveform, out=energy[1:], dtype=np.float64)
+    np.cumsum(energy, out=energy)
+
+    starts = np.arange(0, n - frame_length + 1, hop_length)
+    power = energy[starts + frame_length] - energy[starts]
+    loud = np.flatnonzero(power > power.max() * 10 ** (-top_db / 10))
+    if loud.size == 0:
+        return waveform[:0]
+    # Хвост короче кадра сохраняется, если последний кадр не тихий
+    end = n if loud[-1] == len(starts) - 1 else starts[loud[-1]] + frame_length
+    return waveform[starts[loud[0]]:end]
+
+@functools.lru_cache(maxsize=16)
+def highpass_sos(cutoff_hz, sample_rate, order=4):
+    """
+    Коэффициенты фильтра Баттерворта верхних частот (кэшируются по частотам).
+    """
+    return signal.butter(order, cutoff_hz, btype='highpass', fs=sample_rate, output='sos')
+
 def remove_noise(waveform, sample_rate):
     """
-    Отключено: возвращает исходный сигнал без изменений.
+    Шумоподавление спектральным гейтом: уровень стационарного шума оценивается в каждой
+    частотной полосе как нижний перцентиль амплитуды по кадрам, полосы ниже порога
+    ослабляются мягкой маской (не сильнее NOISE_FLOOR_GAIN).
     """
-    return waveform
+    if len(waveform) < NOISE_NPERSEG:
+        return waveform
+    _, _, spectrum = signal.stft(waveform, fs=sample_rate, nperseg=NOISE_NPERSEG, noverlap=NOISE_NOVERLAP)
+    magnitude = np.abs(spectrum)
+    noise = np.percentile(magnitude, NOISE_PERCENTILE, axis=1, keepdims=True)
+    magnitude += 1e-10
+    np.divide(noise * NOISE_THRESHOLD, magnitude, out=magnitude)
+    np.subtract(1.0, magnitude, out=magnitude)
+    np.clip(magnitude, NOISE_FLOOR_GAIN, 1.0, out=magnitude)
+    spectrum *= magnitude
+    _, cleaned = signal.istft(spectrum, fs=sample_rate, nperseg=NOISE_NPERSEG, noverlap=NOISE_NOVERLAP)
+    return cleaned[:len(waveform)].astype(np.float32, copy=False)
 
-def enhance_voice(waveform, sample_rate):
+def enhance_voice(waveform, sample_rate, cutoff_hz=None):
     """
-    Отключено: возвращает исходный сигнал без изменений.
+    Фильтр верхних частот: убирает гул и низкочастотный шум ниже диапазона речи.
     """
-    return waveform
+    cutoff_hz = cutoff_hz or AUDIO_HIGHPASS_HZ
+    if not cutoff_hz:
+        return waveform
+    return signal.sosfilt(highpass_sos(cutoff_hz, sample_rate), waveform).astype(np.float32, copy=False)
+
+def enhance_audio(waveform, sample_rate, highpass_hz=None, noise_suppression=None):
+    """
+    Обработка аудио за один этап: опционально фильтр верхних частот и шумоподавление,
+    затем обрезка тишины и однократная нормализация.
+    Сигнал float32 изменяется на месте; возвращается срез без тишины по краям.
+    """
+    highpass_hz = AUDIO_HIGHPASS_HZ if highpass_hz is None else highpass_hz
+    noise_suppression = AUDIO_NOISE_SUPPRESSION if noise_suppression is None else noise_suppression
+
+    waveform = np.asarray(waveform, dtype=np.float32)
+    if highpass_hz:
+        waveform = enhance_voice(waveform, sample_rate, highpass_hz)
+    if noise_suppression:
+        waveform = remove_noise(waveform, sample_rate)
+
+    # Порог обрезки задаётся относительно пика, поэтому нормализация нужна только одна
+    waveform = trim_silence(waveform)
+    return normalize_inplace(waveform)
+
+def enhance_audio_batch(waveforms, sample_rate, highpass_hz=None, noise_suppression=None):
+    """
+    Обработка списка сигналов в пуле потоков. Сигналы изменяются на месте.
+    """
+    if len(waveforms) <= 1 or AUDIO_PREPROCESS_WORKERS <= 1:
+        return [enhance_audio(w, sample_rate, highpass_hz, noise_suppression) for w in waveforms]
+    with ThreadPoolExecutor(max_workers=min(AUDIO_PREPROCESS_WORKERS, len(waveforms))) as executor:
+        return list(executor.map(
+            lambda w: enhance_audio(w, sample_rate, highpass_hz, noise_suppression), waveforms
+        ))
+
+def split_on_pauses(waveform, sample_rate, max_segment_sec=20.0, top_db=35, frame_sec=0.02):
+    """
+    Делит длинный сигнал на фрагменты не длиннее max_segment_sec по паузам (энергетический VAD).
+    Разрез делается в самом тихом кадре второй половины допустимого окна;
+    фрагменты, целиком состоящие из тишины, отбрасываются.
+    :return: Список (начало, конец) в отсчётах
+    """
+    hop = max(1, int(frame_sec * sample_rate))
+    n_frames = len(waveform) // hop
+    if n_frames == 0:
+        return [(0, len(waveform))] if len(waveform) else []
+
+    frames = waveform[:n_frames * hop].reshape(n_frames, hop)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    silent = energy_db < energy_db.max() - top_db
 
-def preprocess_audio(audio_path, target_sr=16000):
+    max_frames = max(2, int(max_segment_sec * sample_rate) // hop)
+    segments = []
+    start = 0
+    while start < n_frames:
+        if start + max_frames >= n_frames:
+            end = n_frames
+        else:
+            search_from = start + max_frames // 2
+            end = search_from + int(np.argmin(energy_db[search_from:start + max_frames])) + 1
+        if not silent[start:end].all():
+            segments.append((start * hop, len(waveform) if end == n_frames else end * hop))
+        start = end
+    return segments
+
+@timed('preprocess')
+def preprocess_waveform(waveform, sample_rate, target_sr=16000):
     """
-    Предварительная обработка аудиофайла перед распознаванием.
+    Предварительная обработка сигнала в памяти: ресемплинг и улучшение качества.
+    Возвращает float32-сигнал с частотой target_sr; float32-вход с частотой target_sr
+    обрабатывается на месте.
     """
-    # Загрузка аудио
-    waveform, sr = librosa.load(audio_path, sr=None)
-    
     # Ресемплинг если нужно
-    if sr != target_sr:
-        waveform = librosa.resample(waveform, orig_sr=sr, target_sr=target_sr)
-        sr = target_sr
-    
+    if sample_rate != target_sr:
+        waveform = librosa.resample(waveform, orig_sr=sample_rate, target_sr=target_sr)
+
     # Улучшение качества
-    enhanced_waveform = enhance_audio(waveform, sr)
-    
-    # Сохранение обработанного аудио
-    temp_path = audio_path + '.enhanced.wav'
-    sf.write(temp_path, enhanced_waveform, sr)
-    
-    return temp_path 
\ No newline at end of file
+    return enhance_audio(waveform, target_sr)
+
+def spill_audio(waveform, sample_rate, directory, suffix='.enhanced.wav'):
+    """
+    Сохраняет сигнал на диск (для отладки). Возвращает путь к файлу.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{uuid.uuid4().hex}{suffix}")
+    sf.write(path, waveform, sample_rate)
+    return path
@@ -0,0 +1,81 @@
+# app/batching.py
+# Динамическое объединение параллельных запросов в пакеты (micro-batching)
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class BatchScheduler:
+    """
+    Собирает элементы, поступившие в течение короткого окна, в один пакет
+    и обрабатывает их одним вызовом process_batch.
+
+    :param process_batch: Функция list[item] -> list[result] той же длины
+    :param max_batch_size: Максимальный размер пакета
+    :param max_wait_ms: Сколько ждать дополнительных элементов после первого
+    """
+
+    def __init__(self, process_batch, max_batch_size=8, max_wait_ms=10, name='batch'):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        # Поток запускается лениво и перезапускается в дочернем процессе после fork
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name=f"{self.name}-scheduler", daemon=True)
+                self._thread.start()
+
+    def submit(self, item):
+        """
+        Ставит элемент в очередь. Возвращает Future с результатом обработки.
+        """
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = list(self.process_batch(items))
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"{self.name}: получено {len(results)} результатов на пакет из {len(batch)} элементов"
+                    )
+            except Exception as e:
+                # Ни один запрос пакета не должен остаться без ответа
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
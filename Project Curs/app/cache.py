@@ -0,0 +1,197 @@
+# app/cache.py
+# Кэши результатов: LRU в памяти процесса с TTL, кэш на диске и общий кэш в Redis
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Потокобезопасный LRU-кэш в памяти процесса с ограничением размера и временем жизни записей.
+
+    :param max_size: Максимальное число записей
+    :param ttl: Время жизни записи в секундах (None — бессрочно)
+    """
+
+    def __init__(self, max_size=1024, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires_at = item
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return value
+                del self._data[key]
+            self.stats['misses'] += 1
+            return default
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, size=len(self._data), max_size=self.max_size)
+
+
+class RedisCache:
+    """
+    Кэш в Redis, общий для всех процессов. Значения хранятся в JSON.
+
+    :param url: Адрес Redis
+    :param prefix: Префикс ключей
+    :param ttl: Время жизни записи в секундах (None — бессрочно)
+    """
+
+    def __init__(self, url, prefix='cache:', ttl=None):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+        self.stats = {'hits': 0, 'misses': 0, 'errors': 0}
+
+    def get(self, key, default=None):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception:
+            # Недоступный Redis не должен ломать обработку запроса
+            self.stats['errors'] += 1
+            return default
+        if raw is None:
+            self.stats['misses'] += 1
+            return default
+        self.stats['hits'] += 1
+        return json.loads(raw)
+
+    def set(self, key, value):
+        try:
+            self.client.set(self.prefix + key, json.dumps(value), ex=int(self.ttl) if self.ttl else None)
+        except Exception:
+            self.stats['errors'] += 1
+
+    def get_stats(self):
+        return dict(self.stats)
+
+
+class DiskCache:
+    """
+    Кэш в каталоге на диске (переживает перезапуск процесса). Значения хранятся в JSON,
+    число файлов ограничено max_entries — при превышении удаляются самые старые.
+
+    :param directory: Каталог для файлов кэша
+    :param max_entries: Максимальное число записей
+    :param ttl: Время жизни записи в секундах (None — бессрочно)
+    """
+    PRUNE_EVERY = 64
+
+    def __init__(self, directory, max_entries=10000, ttl=None):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'errors': 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            if self.ttl and time.time() - os.path.getmtime(path) > self.ttl:
+                os.unlink(path)
+                raise FileNotFoundError(path)
+            with open(path, encoding='utf-8') as f:
+                value = json.load(f)
+        except FileNotFoundError:
+            self.stats['misses'] += 1
+            return default
+        except (OSError, ValueError):
+            self.stats['errors'] += 1
+            return default
+        self.stats['hits'] += 1
+        return value
+
+    def set(self, key, value):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._prune()
+        except OSError:
+            self.stats['errors'] += 1
+
+    def _prune(self):
+        with self._lock:
+            # Каталог просматривается не при каждой записи, а раз в PRUNE_EVERY записей
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY:
+                return
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')]
+            if len(entries) <= self.max_entries:
+                return
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:len(entries) - self.max_entries]:
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+
+    def get_stats(self):
+        return dict(self.stats)
+
+
+class TieredCache:
+    """
+    Двухуровневый кэш: быстрый локальный уровень перед общим (например, Redis).
+    Найденное во втором уровне копируется в первый.
+    """
+
+    def __init__(self, primary, secondary=None):
+        self.primary = primary
+        self.secondary = secondary
+
+    def get(self, key, default=None):
+        value = self.primary.get(key)
+        if value is None and self.secondary is not None:
+            value = self.secondary.get(key)
+            if value is not None:
+                self.primary.set(key, value)
+        return default if value is None else value
+
+    def set(self, key, value):
+        self.primary.set(key, value)
+        if self.secondary is not None:
+            self.secondary.set(key, value)
+
+    def get_stats(self):
+        stats = {'memory': self.primary.get_stats()}
+        if self.secondary is not None:
+            stats['shared'] = self.secondary.get_stats()
+        return stats
@@ -0,0 +1,23 @@
+# app/celery_config.py
+# Настройки Celery (брокер и хранилище результатов)
+
+import os
+
+broker_url = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+result_backend = os.environ.get('CELERY_RESULT_BACKEND', broker_url)
+
+# Распознавание и текстовые этапы можно обслуживать разными воркерами:
+#   celery -A app.celery_worker.celery worker -Q asr
+#   celery -A app.celery_worker.celery worker -Q text
+ASR_QUEUE = os.environ.get('CELERY_ASR_QUEUE', 'asr')
+TEXT_QUEUE = os.environ.get('CELERY_TEXT_QUEUE', 'text')
+
+task_routes = {
+    'app.tasks.recognize_task': {'queue': ASR_QUEUE},
+    'app.tasks.punctuate_task': {'queue': TEXT_QUEUE},
+    'app.tasks.translate_task': {'queue': TEXT_QUEUE},
+}
+
+task_serializer = 'json'
+result_serializer = 'json'
+accept_content = ['json']
@@ -1,11 +1,19 @@
 from celery import Celery
 from app import create_app
+from app import celery_config
 
 def make_celery(app):
     celery = Celery(
         app.import_name,
-        backend='redis://localhost:6379/0',
-        broker='redis://localhost:6379/0'
+        backend=celery_config.result_backend,
+        broker=celery_config.broker_url,
+        include=['app.tasks']
+    )
+    celery.conf.update(
+        task_routes=celery_config.task_routes,
+        task_serializer=celery_config.task_serializer,
+        result_serializer=celery_config.result_serializer,
+        accept_content=celery_config.accept_content
     )
     celery.conf.update(app.config)
     TaskBase = celery.Task
@@ -0,0 +1,331 @@
+# app/ctc_decoder.py
+# Декодирование CTC лучевым поиском по префиксам с опциональной n-граммной языковой моделью (ARPA)
+
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Параметры лучевого поиска
+CTC_BEAM_WIDTH = int(os.environ.get('CTC_BEAM_WIDTH', 16))
+# Сколько самых вероятных символов кадра рассматривается при расширении префиксов
+CTC_TOKEN_TOP_K = int(os.environ.get('CTC_TOKEN_TOP_K', 8))
+# Символы с логарифмом вероятности ниже порога отбрасываются
+CTC_TOKEN_MIN_LOG_PROB = float(os.environ.get('CTC_TOKEN_MIN_LOG_PROB', -8.0))
+# Кадры, где вероятность пустого символа выше порога, обрабатываются как чистый пропуск
+CTC_BLANK_SKIP_THRESHOLD = float(os.environ.get('CTC_BLANK_SKIP_THRESHOLD', 0.999))
+# Вес языковой модели и бонус за слово
+CTC_LM_ALPHA = float(os.environ.get('CTC_LM_ALPHA', 0.5))
+CTC_LM_BETA = float(os.environ.get('CTC_LM_BETA', 1.0))
+# Потоки для декодирования нескольких фрагментов
+CTC_DECODER_WORKERS = int(os.environ.get('CTC_DECODER_WORKERS', 4))
+# Бюджет лучевого поиска как доля времени прямого прохода модели (0 — без ограничения);
+# фрагменты, не уложившиеся в бюджет, декодируются жадно
+CTC_BEAM_MAX_FORWARD_RATIO = float(os.environ.get('CTC_BEAM_MAX_FORWARD_RATIO', 0.5))
+
+NEG_INF = float('-inf')
+LOG10_TO_LN = math.log(10)
+# Вероятность неизвестного слова, если в модели нет <unk> (log10)
+UNK_LOG10_PROB = -10.0
+
+decoder_executor = ThreadPoolExecutor(max_workers=CTC_DECODER_WORKERS, thread_name_prefix='ctc-decoder')
+
+# Загруженные языковые модели по пути к файлу
+language_models = {}
+language_models_lock = threading.Lock()
+
+
+class DecodeBudgetExceeded(Exception):
+    """Лучевой поиск не уложился в отведённое время."""
+
+
+def _logsumexp(a, b):
+    if a == NEG_INF:
+        return b
+    if b == NEG_INF:
+        return a
+    if a > b:
+        return a + math.log1p(math.exp(b - a))
+    return b + math.log1p(math.exp(a - b))
+
+
+def log_softmax(logits):
+    logits = np.asarray(logits, dtype=np.float32)
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    shifted -= np.log(np.exp(shifted).sum(axis=-1, keepdims=True))
+    return shifted
+
+
+class NGramLanguageModel:
+    """
+    Словная n-граммная модель в формате ARPA (как у KenLM) с откатом по Кацу.
+    Слова приводятся к нижнему регистру (как и запросы декодера), поэтому
+    подходят и модели в верхнем регистре, например LibriSpeech.
+    """
+
+    def __init__(self, ngrams, order):
+        self.ngrams = ngrams
+        self.order = order
+
+    @classmethod
+    def from_arpa(cls, path):
+        ngrams = {}
+        order = 0
+        current = 0
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line == '\\data\\' or line.startswith('ngram '):
+                    continue
+                if line == '\\end\\':
+                    break
+                if line.startswith('\\') and line.endswith('-grams:'):
+                    current = int(line[1:line.index('-')])
+                    order = max(order, current)
+                    continue
+                if not current:
+                    continue
+                parts = line.split()
+                words = tuple(word.lower() for word in parts[1:1 + current])
+                backoff = float(parts[1 + current]) if len(parts) > 1 + current else 0.0
+                ngrams[words] = (float(parts[0]), backoff)
+        return cls(ngrams, order)
+
+    def trim_context(self, context):
+        return tuple(context[max(0, len(context) - self.order + 1):]) if self.order > 1 else ()
+
+    def score(self, context, word):
+        """
+        Натуральный логарифм P(word | context).
+        """
+        context = self.trim_context(context)
+        backoff = 0.0
+        while True:
+            entry = self.ngrams.get(context + (word,))
+            if entry is not None:
+                return (entry[0] + backoff) * LOG10_TO_LN
+            if not context:
+                unknown = self.ngrams.get(('<unk>',))
+                return ((unknown[0] if unknown else UNK_LOG10_PROB) + backoff) * LOG10_TO_LN
+            context_entry = self.ngrams.get(context)
+            if context_entry is not None:
+                backoff += context_entry[1]
+            context = context[1:]
+
+
+def load_language_model(path):
+    """
+    Загружает ARPA-модель один раз на процесс.
+    """
+    with language_models_lock:
+        if path not in language_models:
+            print(f"⏳ Загружаем языковую модель {path}")
+            language_models[path] = NGramLanguageModel.from_arpa(path)
+        return language_models[path]
+
+
+class CTCBeamDecoder:
+    """
+    Лучевой поиск по префиксам для выходов CTC.
+
+    Отсечение векторизовано по всем кадрам сразу: кадры с доминирующим пустым символом
+    не расширяют префиксы, а в остальных рассматриваются только top-k символов выше порога.
+    Языковая модель учитывается при завершении каждого слова (символ-разделитель).
+
+    :param vocabulary: Строки токенов по их номерам
+    :param blank_id: Номер пустого символа CTC
+    :param word_delimiter_id: Номер разделителя слов (например, '|')
+    :param ignored_ids: Служебные токены, которые не попадают в текст
+    """
+
+    def __init__(self, vocabulary, blank_id, word_delimiter_id=None, ignored_ids=(), lm=None,
+                 alpha=CTC_LM_ALPHA, beta=CTC_LM_BETA, beam_width=CTC_BEAM_WIDTH, token_top_k=CTC_TOKEN_TOP_K,
+                 token_min_log_prob=CTC_TOKEN_MIN_LOG_PROB, blank_skip_threshold=CTC_BLANK_SKIP_THRESHOLD):
+        self.vocabulary = list(vocabulary)
+        self.blank_id = blank_id
+        self.word_delimiter_id = word_delimiter_id
+        self.ignored_ids = set(ignored_ids) | {blank_id}
+        self.lm = lm
+        self.alpha = alpha
+        self.beta = beta
+        self.beam_width = beam_width
+        self.token_top_k = token_top_k
+        self.token_min_log_prob = token_min_log_prob
+        self.blank_skip_log_prob = math.log(blank_skip_threshold)
+
+    def _ignored_mask(self, size):
+        mask = np.zeros(size, dtype=bool)
+        mask[[i for i in self.ignored_ids if i is not None and i < size]] = True
+        mask[len(self.vocabulary):] = True
+        return mask
+
+    def _lm_state(self, states, prefix):
+        """
+        Состояние языковой модели префикса: (накопленная оценка, контекст слов, текущее слово).
+        Вычисляется из состояния родительского префикса.
+        """
+        state = states.get(prefix)
+        if state is not None:
+            return state
+        score, context, word = states[prefix[:-1]]
+        token = prefix[-1]
+        if token == self.word_delimiter_id:
+            if word:
+                score += self.alpha * self.lm.score(context, word) + self.beta
+                context = self.lm.trim_context(context + (word,))
+                word = ''
+        else:
+            word += self.vocabulary[token].lower()
+        state = states[prefix] = (score, context, word)
+        return state
+
+    def _final_lm_score(self, state, final=True):
+        score, context, word = state
+        if word:
+            score += self.alpha * self.lm.score(context, word) + self.beta
+            context = self.lm.trim_context(context + (word,))
+        return score + self.alpha * self.lm.score(context, '</s>') if final else score
+
+    def initial_context(self, text=''):
+        """
+        Контекст языковой модели после начала предложения и уже распознанного текста.
+        """
+        if self.lm is None:
+            return ()
+        return self.lm.trim_context(('<s>',) + tuple(text.lower().split()))
+
+    def decode(self, logits, context=None, final=True, deadline=None):
+        """
+        :param logits: Матрица логитов (кадры × словарь) одного фрагмента
+        :param context: Начальный контекст языковой модели (по умолчанию — начало предложения)
+        :param final: Учитывать конец предложения (False для промежуточных частей потока)
+        :param deadline: Момент time.perf_counter(), после которого бросается DecodeBudgetExceeded
+        :return: Распознанный текст
+        """
+        log_probs = log_softmax(logits)
+        if log_probs.ndim == 3:
+            log_probs = log_probs[0]
+        n_frames, size = log_probs.shape
+        if n_frames == 0:
+            return ''
+
+        # Векторизованное отсечение: активные кадры и top-k символов каждого из них
+        blank_log_probs = log_probs[:, self.blank_id]
+        blank_cumsum = np.concatenate(([0.0], np.cumsum(blank_log_probs, dtype=np.float64)))
+        active = np.flatnonzero(blank_log_probs < self.blank_skip_log_prob)
+        k = min(self.token_top_k, size)
+        active_log_probs = log_probs[active]
+        top = np.argpartition(active_log_probs, size - k, axis=1)[:, size - k:]
+        top_log_probs = np.take_along_axis(active_log_probs, top, axis=1)
+        keep = (top_log_probs > self.token_min_log_prob) & ~self._ignored_mask(size)[top]
+
+        beams = {(): (0.0, NEG_INF)}
+        lm_states = {(): (0.0, self.initial_context() if context is None else tuple(context), '')}
+        previous = -1
+        for row, frame in enumerate(active):
+            if deadline is not None and time.perf_counter() > deadline:
+                raise DecodeBudgetExceeded()
+            if frame > previous + 1:
+                # Пропущенные кадры — только пустой символ: префиксы не меняются
+                skipped = float(blank_cumsum[frame] - blank_cumsum[previous + 1])
+                beams = {prefix: (_logsumexp(p_b, p_nb) + skipped, NEG_INF) for prefix, (p_b, p_nb) in beams.items()}
+            previous = frame
+
+            frame_log_probs = log_probs[frame]
+            blank_log_prob = float(frame_log_probs[self.blank_id])
+            candidates = [(int(token), float(frame_log_probs[token])) for token in top[row][keep[row]]]
+
+            next_beams = defaultdict(lambda: [NEG_INF, NEG_INF])
+            for prefix, (p_b, p_nb) in beams.items():
+                total = _logsumexp(p_b, p_nb)
+                stay = next_beams[prefix]
+                stay[0] = _logsumexp(stay[0], total + blank_log_prob)
+                last = prefix[-1] if prefix else None
+                for token, log_prob in candidates:
+                    if token == last:
+                        # Повтор символа без пустого между ними схлопывается в тот же префикс
+                        stay[1] = _logsumexp(stay[1], p_nb + log_prob)
+                        extended_score = p_b + log_prob
+                    else:
+                        extended_score = total + log_prob
+                    extended = next_beams[prefix + (token,)]
+                    extended[1] = _logsumexp(extended[1], extended_score)
+
+            beams = self._prune(next_beams, lm_states)
+            if self.lm is not None:
+                lm_states = {prefix: self._lm_state(lm_states, prefix) for prefix in beams}
+
+        if previous < n_frames - 1:
+            skipped = float(blank_cumsum[n_frames] - blank_cumsum[previous + 1])
+            beams = {prefix: (_logsumexp(p_b, p_nb) + skipped, NEG_INF) for prefix, (p_b, p_nb) in beams.items()}
+
+        def final_score(item):
+            prefix, (p_b, p_nb) = item
+            score = _logsumexp(p_b, p_nb)
+            if self.lm is not None:
+                score += self._final_lm_score(self._lm_state(lm_states, prefix), final)
+            return score
+
+        best, _ = max(beams.items(), key=final_score)
+        return self.to_text(best)
+
+    def _prune(self, candidates, lm_states):
+        def score(item):
+            prefix, (p_b, p_nb) = item
+            total = _logsumexp(p_b, p_nb)
+            if self.lm is not None:
+                total += self._lm_state(lm_states, prefix)[0]
+            return total
+
+        if len(candidates) <= self.beam_width:
+            return {prefix: tuple(probs) for prefix, probs in candidates.items()}
+        best = sorted(candidates.items(), key=score, reverse=True)[:self.beam_width]
+        return {prefix: tuple(probs) for prefix, probs in best}
+
+    def to_text(self, prefix):
+        tokens = (' ' if token == self.word_delimiter_id else self.vocabulary[token] for token in prefix)
+        return ' '.join(''.join(tokens).split())
+
+    def _decode_within(self, logits, deadline):
+        try:
+            return self.decode(logits, deadline=deadline)
+        except DecodeBudgetExceeded:
+            return None
+
+    def decode_batch(self, logits_list, deadline=None):
+        """
+        Декодирует несколько матриц логитов в пуле потоков. Поиск на чистом Python
+        держит GIL, поэтому параллельно выполняется только NumPy-часть (log-softmax, отсечение).
+        :param deadline: Общий срок для всех фрагментов (time.perf_counter())
+        :return: Тексты; None для фрагментов, не уложившихся в срок
+        """
+        if len(logits_list) <= 1:
+            return [self._decode_within(logits, deadline) for logits in logits_list]
+        return list(decoder_executor.map(lambda logits: self._decode_within(logits, deadline), logits_list))
+
+
+def build_decoder(processor, config):
+    """
+    Создаёт лучевой декодер для языка, если в конфигурации указано 'decoder': 'beam'.
+    Языковая модель подключается из 'lm_path' (ARPA). Для жадного декодирования возвращает None.
+    """
+    if config.get('decoder', 'greedy') != 'beam':
+        return None
+
+    tokenizer = processor.tokenizer
+    vocab = tokenizer.get_vocab()
+    vocabulary = [''] * (max(vocab.values()) + 1)
+    for token, index in vocab.items():
+        vocabulary[index] = token
+
+    lm_path = config.get('lm_path')
+    return CTCBeamDecoder(
+        vocabulary,
+        blank_id=tokenizer.pad_token_id,
+        word_delimiter_id=vocab.get(tokenizer.word_delimiter_token),
+        ignored_ids=tokenizer.all_special_ids,
+        lm=load_language_model(lm_path) if lm_path else None
+    )
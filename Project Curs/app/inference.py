@@ -0,0 +1,209 @@
+# app/inference.py
+# Движки инференса wav2vec2 на CPU: eager PyTorch, динамическое int8-квантование,
+# TorchScript и ONNX Runtime
+
+import io
+import os
+import re
+import numpy as np
+from app.lazy import lazy_import
+
+torch = lazy_import('torch')
+
+INFERENCE_BACKENDS = ('eager', 'quantized', 'torchscript', 'onnx')
+
+# Число потоков внутри одной операции (0 — значение по умолчанию torch/onnxruntime)
+ASR_NUM_THREADS = int(os.environ.get('ASR_NUM_THREADS', 0))
+
+ONNX_CACHE_DIR = "./models/onnx"
+
+# Длина примера (в отсчётах), на котором трассируется/экспортируется граф
+EXPORT_EXAMPLE_SAMPLES = 16000
+
+_threads_configured = False
+
+
+def configure_threads():
+    """
+    Применяет ASR_NUM_THREADS к torch (один раз на процесс).
+    """
+    global _threads_configured
+    if not _threads_configured and ASR_NUM_THREADS > 0:
+        torch.set_num_threads(ASR_NUM_THREADS)
+    _threads_configured = True
+
+
+class ModelOutput:
+    """
+    Минимальный аналог выхода transformers: только логиты.
+    """
+
+    def __init__(self, logits):
+        self.logits = logits
+
+
+def feat_extract_output_lengths(config, input_lengths):
+    """
+    Число кадров логитов для сигналов заданной длины — то же, что
+    Wav2Vec2ForCTC._get_feat_extract_output_lengths, но по одной конфигурации:
+    графовым движкам не нужно держать ссылку на исходную модель.
+    """
+    lengths = input_lengths
+    for kernel, stride in zip(config.conv_kernel, config.conv_stride):
+        lengths = torch.div(lengths - kernel, stride, rounding_mode='floor') + 1
+    if getattr(config, 'add_adapter', False):
+        for _ in range(config.num_adapter_layers):
+            lengths = torch.div(lengths - 1, config.adapter_stride, rounding_mode='floor') + 1
+    return lengths
+
+
+class _GraphModel:
+    """
+    Общая часть для моделей в виде графа: интерфейс model(input_values, attention_mask).logits,
+    как у Wav2Vec2ForCTC, и расчёт длины выхода для пакетной обработки.
+    Хранится только конфигурация: fp32-модель после экспорта освобождается.
+    """
+
+    def __init__(self, model):
+        self.config = model.config
+
+    def _get_feat_extract_output_lengths(self, input_lengths):
+        return feat_extract_output_lengths(self.config, input_lengths)
+
+    @staticmethod
+    def _mask(input_values, attention_mask):
+        if attention_mask is None:
+            attention_mask = torch.ones(input_values.shape, dtype=torch.long)
+        return attention_mask.to(torch.long)
+
+
+def _logits_module(model):
+    """
+    Обёртка над моделью, возвращающая только тензор логитов (нужно для трассировки и экспорта).
+    """
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_values, attention_mask):
+            return self.model(input_values, attention_mask=attention_mask, return_dict=False)[0]
+
+    return LogitsOnly().eval()
+
+
+def _example_inputs():
+    return (
+        torch.zeros(1, EXPORT_EXAMPLE_SAMPLES),
+        torch.ones(1, EXPORT_EXAMPLE_SAMPLES, dtype=torch.long)
+    )
+
+
+class TorchScriptWav2Vec2(_GraphModel):
+    def __init__(self, model):
+        super().__init__(model)
+        with torch.no_grad():
+            self.graph = torch.jit.trace(_logits_module(model), _example_inputs(), check_trace=False)
+        self.graph = torch.jit.freeze(self.graph)
+
+    def __call__(self, input_values, attention_mask=None, **kwargs):
+        return ModelOutput(self.graph(input_values, self._mask(input_values, attention_mask)))
+
+
+class OnnxWav2Vec2(_GraphModel):
+    def __init__(self, model, onnx_path):
+        import onnxruntime
+        super().__init__(model)
+
+        if not os.path.exists(onnx_path):
+            print(f"⏳ Экспортируем модель в ONNX: {onnx_path}")
+            os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+            with torch.no_grad():
+                torch.onnx.export(
+                    _logits_module(model), _example_inputs(), onnx_path,
+                    input_names=['input_values', 'attention_mask'],
+                    output_names=['logits'],
+                    dynamic_axes={
+                        'input_values': {0: 'batch', 1: 'samples'},
+                        'attention_mask': {0: 'batch', 1: 'samples'},
+                        'logits': {0: 'batch', 1: 'frames'},
+                    },
+                    opset_version=14
+                )
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = ASR_NUM_THREADS
+        self.onnx_path = onnx_path
+        self.session = onnxruntime.InferenceSession(
+            onnx_path, sess_options=options, providers=['CPUExecutionProvider']
+        )
+
+    def __call__(self, input_values, attention_mask=None, **kwargs):
+        logits = self.session.run(['logits'], {
+            'input_values': input_values.numpy().astype(np.float32),
+            'attention_mask': self._mask(input_values, attention_mask).numpy(),
+        })[0]
+        return ModelOutput(torch.from_numpy(logits))
+
+
+def serialized_size(module):
+    """
+    Объём весов модели по сериализованному state_dict (учитывает упакованные int8-веса).
+    """
+    buffer = io.BytesIO()
+    torch.save(module.state_dict(), buffer)
+    return buffer.tell()
+
+
+def onnx_path(model_id):
+    return os.path.join(ONNX_CACHE_DIR, model_id.replace("/", "__") + ".onnx")
+
+
+def build_inference_model(model, backend, model_id):
+    """
+    Готовит загруженную Wav2Vec2ForCTC к инференсу выбранным движком.
+    :param model: Модель transformers в режиме eval
+    :param backend: Один из INFERENCE_BACKENDS
+    :param model_id: Идентификатор модели — по нему именуется файл экспортированного графа
+    :return: (модель с интерфейсом model(**inputs).logits, объём в байтах)
+    """
+    configure_threads()
+
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Неизвестный движок инференса: {backend}")
+
+    if backend == 'eager':
+        return model, None
+
+    if backend == 'quantized':
+        quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return quantized, serialized_size(quantized)
+
+    if backend == 'torchscript':
+        return TorchScriptWav2Vec2(model), serialized_size(model)
+
+    onnx_model = OnnxWav2Vec2(model, onnx_path(model_id))
+    return onnx_model, os.path.getsize(onnx_model.onnx_path)
+
+
+def word_error_rate(reference, hypothesis):
+    """
+    WER: расстояние Левенштейна по словам, делённое на число слов эталона.
+    Используется для сравнения движков инференса с eager fp32.
+    """
+    ref = re.findall(r'\w+', reference.lower())
+    hyp = re.findall(r'\w+', hypothesis.lower())
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            )
+        previous = current
+    return previous[-1] / len(ref)
@@ -0,0 +1,49 @@
+# app/lazy.py
+# Отложенный импорт тяжёлых библиотек (torch, transformers, librosa и т.д.)
+
+import importlib
+import threading
+
+
+class LazyModule:
+    """
+    Заместитель модуля: настоящий импорт выполняется при первом обращении к атрибуту.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _lazy_load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._lazy_load(), attr)
+
+    def __dir__(self):
+        return dir(self._lazy_load())
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    """
+    Возвращает модуль, который будет импортирован при первом использовании.
+    """
+    return LazyModule(name)
+
+
+def import_now(*modules):
+    """
+    Принудительно импортирует отложенные модули (для прогрева при старте).
+    """
+    for module in modules:
+        if isinstance(module, LazyModule):
+            module._lazy_load()
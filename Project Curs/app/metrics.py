@@ -0,0 +1,168 @@
+# app/metrics.py
+# Метрики в формате Prometheus: счётчики, гистограммы длительности этапов и метрики-обратные вызовы
+# Значения хранятся в памяти процесса: под gunicorn у каждого воркера свои счётчики
+
+import threading
+import time
+from contextlib import ContextDecorator
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.type = 'counter'
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class _Timer(ContextDecorator):
+    # Замер длительности: можно использовать как with-блок и как декоратор
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def _recreate_cm(self):
+        # Каждый вызов декорированной функции получает свой таймер (потокобезопасно)
+        return _Timer(self.histogram, self.labels)
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self._started, **self.labels)
+        return False
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.type = 'histogram'
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def samples(self):
+        result = []
+        with self._lock:
+            for key, (counts, total) in self._values.items():
+                for bound, count in zip(self.buckets, counts):
+                    result.append((f"{self.name}_bucket", key + (('le', _format_value(bound)),), count))
+                result.append((f"{self.name}_sum", key, total))
+                result.append((f"{self.name}_count", key, counts[-1]))
+        return result
+
+
+class CallbackMetric:
+    """
+    Метрика, значения которой вычисляются при каждом запросе /metrics.
+    :param callback: Функция без аргументов, возвращающая число
+        или список пар (словарь меток, значение)
+    """
+
+    def __init__(self, name, documentation, callback, type='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.callback = callback
+
+    def samples(self):
+        values = self.callback()
+        if isinstance(values, (int, float)):
+            values = [({}, values)]
+        return [(self.name, tuple(sorted(labels.items())), value) for labels, value in values]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            # Повторная регистрация (например, при перезагрузке модуля) заменяет метрику
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation):
+        return self.register(Counter(name, documentation))
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, buckets))
+
+    def callback(self, name, documentation, callback, type='gauge'):
+        return self.register(CallbackMetric(name, documentation, callback, type))
+
+    def render(self):
+        """
+        Текстовый формат экспозиции Prometheus.
+        """
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+# Длительность этапов конвейера: decode, preprocess, get_model, forward, punctuation, translation
+STAGE_DURATION = registry.histogram(
+    'synchrony_stage_duration_seconds', 'Duration of pipeline stages in seconds'
+)
+
+
+def timed(stage, **labels):
+    """
+    Замер длительности этапа в STAGE_DURATION (декоратор или with-блок).
+    """
+    return STAGE_DURATION.time(stage=stage, **labels)
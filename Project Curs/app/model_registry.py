@@ -0,0 +1,153 @@
+# app/model_registry.py
+# Реестр загруженных моделей: LRU-вытеснение, бюджет памяти, предзагрузка и счётчики
+
+import threading
+from collections import OrderedDict
+
+
+def estimate_model_bytes(model):
+    """
+    Оценивает объём памяти, занимаемый весами и буферами torch-модели.
+    """
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelRegistry:
+    """
+    Хранит загруженные модели с ограничением по суммарному объёму памяти.
+    При превышении бюджета вытесняются давно не использовавшиеся модели (LRU).
+
+    Место под новую модель освобождается до её загрузки, поэтому пиковый объём
+    не превышает бюджет на время загрузки.
+
+    :param loader: Функция key -> entry, загружающая модель
+    :param sizer: Функция entry -> объём в байтах
+    :param memory_budget: Бюджет памяти в байтах (None — без ограничения)
+    :param estimator: Функция key -> ожидаемый объём в байтах до загрузки (None — неизвестен)
+    :param normalize: Функция, приводящая ключ к каноническому виду
+    """
+
+    def __init__(self, loader, sizer, memory_budget=None, estimator=None, normalize=None):
+        self.loader = loader
+        self.sizer = sizer
+        self.memory_budget = memory_budget
+        self.estimator = estimator
+        self.normalize = normalize or (lambda key: key)
+        self._entries = OrderedDict()
+        self._sizes = {}
+        # Объёмы когда-либо загруженных моделей: оценка для повторной загрузки после вытеснения
+        self._known_sizes = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.stats = {'loads': 0, 'evictions': 0, 'hits': 0, 'misses': 0}
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, key):
+        """
+        Возвращает модель по ключу, загружая её при необходимости.
+        """
+        key = self.normalize(key)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._entries[key]
+
+        # Загрузка одной и той же модели не выполняется параллельно в нескольких потоках
+        with self._key_lock(key):
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return self._entries[key]
+                self.stats['misses'] += 1
+                # Освобождаем место до загрузки, а не после неё
+                self._evict_over_budget(reserve=self._estimate(key))
+
+            entry = self.loader(key)
+            size = self.sizer(entry)
+
+            with self._lock:
+                self._entries[key] = entry
+                self._sizes[key] = self._known_sizes[key] = size
+                self.stats['loads'] += 1
+                # Оценка могла оказаться заниженной — догоняем бюджет после загрузки
+                self._evict_over_budget(keep=key)
+            return entry
+
+    def _estimate(self, key):
+        """
+        Ожидаемый объём модели до загрузки: ранее измеренный, от estimator или,
+        если он неизвестен, объём самой большой известной модели.
+        """
+        if key in self._known_sizes:
+            return self._known_sizes[key]
+        estimate = self.estimator(key) if self.estimator else None
+        if estimate is None:
+            estimate = max(self._known_sizes.values(), default=0)
+        return estimate
+
+    def _evict_over_budget(self, reserve=0, keep=None):
+        """
+        Вытесняет наименее недавно использованные модели, пока вместе с reserve байт
+        не уложимся в бюджет. Модель keep не вытесняется, даже если одна превышает бюджет.
+        """
+        if self.memory_budget is None:
+            return
+        for key in list(self._entries):
+            if self.memory_bytes() + reserve <= self.memory_budget:
+                break
+            if key == keep:
+                continue
+            self._remove(key)
+
+    def _remove(self, key):
+        del self._entries[key]
+        del self._sizes[key]
+        self.stats['evictions'] += 1
+        print(f"♻️ Модель {key} выгружена из памяти.")
+
+    def evict(self, key):
+        """
+        Принудительно выгружает модель. Возвращает True, если модель была загружена.
+        """
+        key = self.normalize(key)
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def preload(self, keys):
+        """
+        Заранее загружает модели для указанных ключей (каждую не более одного раза).
+        """
+        for key in dict.fromkeys(self.normalize(key) for key in keys):
+            self.get(key)
+
+    def memory_bytes(self):
+        return sum(self._sizes.values())
+
+    def __contains__(self, key):
+        return self.normalize(key) in self._entries
+
+    def loaded_keys(self):
+        return list(self._entries)
+
+    def get_stats(self):
+        """
+        Возвращает счётчики загрузок/вытеснений/попаданий и текущее состояние реестра.
+        """
+        with self._lock:
+            return dict(
+                self.stats,
+                loaded=list(self._entries),
+                memory_bytes=self.memory_bytes(),
+                memory_budget=self.memory_budget
+            )
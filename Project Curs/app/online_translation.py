@@ -0,0 +1,156 @@
+# app/online_translation.py
+# Онлайн-перевод: пул соединений, ограничение параллельности, тайм-ауты, повторы
+# и объединение одинаковых одновременных запросов
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Адрес сервиса перевода (можно указать локальную заглушку для тестов)
+ONLINE_TRANSLATE_URL = os.environ.get(
+    'ONLINE_TRANSLATE_URL', 'https://translate.googleapis.com/translate_a/single'
+)
+ONLINE_TRANSLATE_TIMEOUT = float(os.environ.get('ONLINE_TRANSLATE_TIMEOUT', 5.0))
+ONLINE_TRANSLATE_RETRIES = int(os.environ.get('ONLINE_TRANSLATE_RETRIES', 3))
+# Базовая задержка перед повтором (удваивается с каждой попыткой), в секундах
+ONLINE_TRANSLATE_BACKOFF = float(os.environ.get('ONLINE_TRANSLATE_BACKOFF', 0.5))
+# Предел одной задержки перед повтором, в том числе запрошенной сервером в Retry-After
+ONLINE_TRANSLATE_MAX_BACKOFF = float(os.environ.get('ONLINE_TRANSLATE_MAX_BACKOFF', 5.0))
+# Максимум одновременных запросов (и keep-alive соединений) к одному хосту
+ONLINE_TRANSLATE_MAX_PER_HOST = int(os.environ.get('ONLINE_TRANSLATE_MAX_PER_HOST', 8))
+ONLINE_TRANSLATE_WORKERS = int(os.environ.get('ONLINE_TRANSLATE_WORKERS', 16))
+
+# Ответы, после которых имеет смысл повторить запрос
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class OnlineTranslationError(Exception):
+    def __init__(self, message, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class OnlineTranslationClient:
+    """
+    Клиент онлайн-перевода с пулом keep-alive соединений.
+    Запросы выполняются в пуле потоков: translate_async возвращает Future,
+    поэтому поток запроса Flask может ждать результат с тайм-аутом.
+    Одинаковые запросы, выполняющиеся одновременно, объединяются в один.
+    """
+
+    def __init__(self, base_url=ONLINE_TRANSLATE_URL, timeout=ONLINE_TRANSLATE_TIMEOUT,
+                 retries=ONLINE_TRANSLATE_RETRIES, backoff=ONLINE_TRANSLATE_BACKOFF,
+                 max_backoff=ONLINE_TRANSLATE_MAX_BACKOFF,
+                 max_per_host=ONLINE_TRANSLATE_MAX_PER_HOST, max_workers=ONLINE_TRANSLATE_WORKERS):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_per_host = max_per_host
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_per_host)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='online-translate')
+        self._lock = threading.Lock()
+        self._host_limits = {}
+        self._in_flight = {}
+        self.stats = {'requests': 0, 'retries': 0, 'coalesced': 0, 'errors': 0}
+
+    def translate_async(self, text, target_language, source_language='auto'):
+        """
+        Ставит перевод в очередь. Возвращает Future со строкой перевода.
+        """
+        key = (text, source_language, target_language)
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.stats['coalesced'] += 1
+                return future
+            future = self._executor.submit(self._translate_with_retries, text, source_language, target_language)
+            self._in_flight[key] = future
+
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def translate(self, text, target_language, source_language='auto'):
+        """
+        Синхронный перевод (ожидает результат не дольше суммарного тайм-аута всех попыток).
+        """
+        future = self.translate_async(text, target_language, source_language)
+        return future.result(timeout=self._total_timeout())
+
+    def _total_timeout(self):
+        attempts = self.retries + 1
+        delays = sum(min(self.backoff * (2 ** attempt), self.max_backoff) for attempt in range(self.retries))
+        # Запас на передачу результата из пула потоков
+        return attempts * self.timeout + delays + self.backoff
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def _host_limit(self, host):
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_limits[host]
+
+    def _translate_with_retries(self, text, source_language, target_language):
+        deadline = time.monotonic() + self._total_timeout()
+        for attempt in range(self.retries + 1):
+            try:
+                return self._request(text, source_language, target_language)
+            except (OnlineTranslationError, requests.ConnectionError, requests.Timeout) as e:
+                retryable = getattr(e, 'retryable', True)
+                retry_after = getattr(e, 'retry_after', None)
+                delay = min(retry_after or self.backoff * (2 ** attempt), self.max_backoff)
+                # Сервер просит ждать дольше предела или повтор не успеет до общего тайм-аута
+                gives_up = (
+                    (retry_after or 0) > self.max_backoff
+                    or time.monotonic() + delay + self.timeout > deadline
+                )
+                if not retryable or attempt == self.retries or gives_up:
+                    self.stats['errors'] += 1
+                    raise
+                self.stats['retries'] += 1
+                time.sleep(delay)
+
+    def _request(self, text, source_language, target_language):
+        host = urlparse(self.base_url).netloc
+        with self._host_limit(host):
+            self.stats['requests'] += 1
+            response = self.session.get(
+                self.base_url,
+                params={'client': 'gtx', 'sl': source_language, 'tl': target_language, 'dt': 't', 'q': text},
+                timeout=self.timeout
+            )
+
+        if response.status_code != 200:
+            retry_after = response.headers.get('Retry-After')
+            raise OnlineTranslationError(
+                f"Сервис перевода вернул {response.status_code}",
+                retryable=response.status_code in RETRYABLE_STATUS_CODES,
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+            )
+
+        try:
+            # Формат ответа: [[["перевод", "оригинал", ...], ...], ...]
+            sentences = response.json()[0] or []
+            return ''.join(sentence[0] for sentence in sentences if sentence and sentence[0])
+        except (ValueError, IndexError, TypeError):
+            raise OnlineTranslationError("Некорректный ответ сервиса перевода", retryable=True)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._in_flight))
@@ -0,0 +1,46 @@
+# app/pipeline.py
+# Полный конвейер обработки: распознавание → пунктуация → перевод
+
+from app.speech_recognition import transcribe
+from app.punctuation import punctuate_text
+from app.translation import translate_text
+
+
+def process_speech_to_text(audio, language_code='ru'):
+    """
+    Распознаёт речь и возвращает текст.
+    """
+    return transcribe(audio, language_code=language_code)['text']
+
+def process_translation(audio, source_language='auto', target_language='en', mode='online'):
+    """
+    Распознаёт речь, восстанавливает пунктуацию и переводит текст.
+    :param audio: Байты аудиофайла, файловый объект или путь
+    :return: Словарь с исходным и переведённым текстом, языками и фрагментами
+        распознавания (start/end в секундах и текст без пунктуации)
+    """
+    # Распознавание речи (при source_language='auto' язык определяется по аудио)
+    recognition = transcribe(
+        audio,
+        language_code=source_language,
+        target_language=target_language
+    )
+    actual_source_language = recognition['language']
+
+    # Добавление пунктуации с учетом языка
+    punctuated_text = punctuate_text(recognition['text'], language_code=actual_source_language)
+
+    # Перевод текста
+    translated_text = translate_text(punctuated_text, target_language, mode)
+
+    result = {
+        "original": punctuated_text,
+        "translated": translated_text,
+        "source_language": actual_source_language,
+        "target_language": target_language,
+        "segments": recognition['segments']
+    }
+    # Код причины, если речь в записи не найдена (распознавание пропущено)
+    if 'reason' in recognition:
+        result['reason'] = recognition['reason']
+    return result
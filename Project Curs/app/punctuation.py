@@ -1,45 +1,179 @@
 # app/punctuation.py
 # Модуль для восстановления пунктуации в тексте
 
-from deepmultilingualpunctuation import PunctuationModel
+import os
 import re
+import threading
+from app.metrics import timed
+from app.lazy import lazy_import
+from app.weights import MMAP_WEIGHTS, load_pretrained
 
-# Загружаем локальную модель пунктуации
-punct_model = PunctuationModel()
+transformers = lazy_import('transformers')
 
-def punctuate_text(text, language_code=None):
+PUNCT_MODEL_ID = "oliverguhr/fullstop-punctuation-multi-large"
+
+# Локальная модель пунктуации загружается при первом использовании
+punct_model = None
+punct_model_lock = threading.Lock()
+
+def load_punct_model():
     """
-    Восстанавливает пунктуацию в тексте с учетом языка.
+    Создаёт PunctuationModel. При MMAP_WEIGHTS веса модели отображаются в память
+    и разделяются между процессами, а конвейер собирается из уже загруженной модели.
+    """
+    from deepmultilingualpunctuation import PunctuationModel
+    if not MMAP_WEIGHTS:
+        return PunctuationModel(PUNCT_MODEL_ID)
+
+    config = transformers.AutoConfig.from_pretrained(PUNCT_MODEL_ID)
+    model = load_pretrained(getattr(transformers, config.architectures[0]), PUNCT_MODEL_ID)
+    punct = PunctuationModel.__new__(PunctuationModel)
+    punct.pipe = transformers.pipeline(
+        "ner", model=model, tokenizer=transformers.AutoTokenizer.from_pretrained(PUNCT_MODEL_ID),
+        aggregation_strategy="none"
+    )
+    return punct
+
+def get_punct_model():
+    """
+    Возвращает модель пунктуации, загружая её при первом вызове.
     """
-    # Применяем основную модель
-    punctuated_text = punct_model.restore_punctuation(text)
-    
-    # Дополнительные корректировки для разных языков
-    if language_code:
-        if language_code in ['ru', 'de']:
-            # Исправление кавычек для русского и немецкого
-            punctuated_text = re.sub(r'"([^"]*)"', r'«\1»', punctuated_text)
-            
-        if language_code == 'de':
-            # Специфичные для немецкого правила
-            punctuated_text = re.sub(r'\b([A-Za-z][a-z]*)\b', lambda m: m.group(1).capitalize() 
-                                   if m.group(1) in ['ich', 'sie', 'es', 'er', 'wir', 'ihr'] else m.group(1), 
-                                   punctuated_text)
-            
-        if language_code == 'fr':
-            # Французские пробелы перед двоеточием и т.д.
-            for char in [':', ';', '?', '!']:
-                punctuated_text = re.sub(f'\\s*{char}', f' {char}', punctuated_text)
-    
-    # Общие корректировки
+    global punct_model
+    if punct_model is None:
+        with punct_model_lock:
+            if punct_model is None:
+                print("⏳ Загружаем модель пунктуации...")
+                punct_model = load_punct_model()
+    return punct_model
+
+# Разбиение длинных текстов на фрагменты (как в deepmultilingualpunctuation)
+PUNCT_CHUNK_WORDS = 230
+PUNCT_CHUNK_OVERLAP = 5
+# Сколько фрагментов обрабатывается моделью за один проход
+PUNCT_BATCH_SIZE = int(os.environ.get('PUNCT_BATCH_SIZE', 16))
+
+# Регулярные выражения постобработки компилируются один раз
+QUOTES_PATTERN = re.compile(r'"([^"]*)"')
+DE_PRONOUNS_PATTERN = re.compile(r'\b(ich|sie|es|er|wir|ihr)\b')
+FR_SPACE_PATTERN = re.compile(r'\s*([:;?!])')
+SPACE_AFTER_PERIOD_PATTERN = re.compile(r'\.([A-Za-zА-Яа-яÄäÖöÜüß])')
+MULTIPLE_SPACES_PATTERN = re.compile(r'\s+')
+
+def _capitalize_match(match):
+    return match.group(1).capitalize()
+
+# Языковые правила: (шаблон, замена) применяются по порядку
+LANGUAGE_RULES = {
+    # Исправление кавычек для русского и немецкого
+    'ru': [(QUOTES_PATTERN, r'«\1»')],
+    'de': [
+        (QUOTES_PATTERN, r'«\1»'),
+        # Местоимения с заглавной буквы
+        (DE_PRONOUNS_PATTERN, _capitalize_match),
+    ],
+    # Французские пробелы перед двоеточием и т.д.
+    'fr': [(FR_SPACE_PATTERN, r' \1')],
+}
+
+COMMON_RULES = [
     # Убедиться, что после точки идет пробел
-    punctuated_text = re.sub(r'\.([A-Za-zА-Яа-яÄäÖöÜüß])', r'. \1', punctuated_text)
-    
+    (SPACE_AFTER_PERIOD_PATTERN, r'. \1'),
     # Убедиться, что множественные пробелы заменены одним
-    punctuated_text = re.sub(r'\s+', ' ', punctuated_text)
-    
+    (MULTIPLE_SPACES_PATTERN, ' '),
+]
+
+def postprocess_punctuation(text, language_code=None):
+    """
+    Языковые и общие корректировки текста с восстановленной пунктуацией.
+    """
+    for pattern, replacement in LANGUAGE_RULES.get(language_code, []) + COMMON_RULES:
+        text = pattern.sub(replacement, text)
+
     # Убедиться, что первая буква текста заглавная
-    if punctuated_text and punctuated_text[0].isalpha():
-        punctuated_text = punctuated_text[0].upper() + punctuated_text[1:]
-    
-    return punctuated_text
+    if text and text[0].isalpha():
+        text = text[0].upper() + text[1:]
+
+    return text
+
+def _split_chunks(words):
+    """
+    Делит список слов на перекрывающиеся фрагменты.
+    Возвращает список (слова фрагмента, сколько слов из него брать в результат).
+    """
+    overlap = PUNCT_CHUNK_OVERLAP if len(words) > PUNCT_CHUNK_WORDS else 0
+    chunks = [words[i:i + PUNCT_CHUNK_WORDS] for i in range(0, len(words), PUNCT_CHUNK_WORDS - overlap)]
+
+    # Последний фрагмент, целиком входящий в перекрытие, не нужен
+    if len(chunks) > 1 and len(chunks[-1]) <= overlap:
+        chunks.pop()
+
+    return [(chunk, len(chunk) - overlap) for chunk in chunks[:-1]] + [(chunks[-1], len(chunks[-1]))]
+
+def _tag_words(words, keep, entities):
+    """
+    Сопоставляет метки токенов словам фрагмента: слово получает метку последнего своего подтокена.
+    """
+    tagged = []
+    char_index = 0
+    entity_index = 0
+    for word in words[:keep]:
+        char_index += len(word) + 1
+        label, score = "0", 0.0
+        while entity_index < len(entities) and char_index > entities[entity_index]["end"]:
+            label = entities[entity_index]["entity"]
+            score = entities[entity_index]["score"]
+            entity_index += 1
+        tagged.append([word, label, score])
+    return tagged
+
+def restore_punctuation_batch(texts):
+    """
+    Восстанавливает пунктуацию сразу для нескольких текстов:
+    фрагменты всех текстов обрабатываются моделью пакетами за один вызов.
+    """
+    model = get_punct_model()
+    plans = []
+    chunk_texts = []
+    for text in texts:
+        words = model.preprocess(text)
+        chunks = _split_chunks(words) if words else []
+        plans.append(chunks)
+        chunk_texts.extend(" ".join(chunk) for chunk, _ in chunks)
+
+    if not chunk_texts:
+        return ['' for _ in texts]
+
+    entities = model.pipe(chunk_texts, batch_size=PUNCT_BATCH_SIZE)
+    if len(chunk_texts) == 1 and (not entities or isinstance(entities[0], dict)):
+        entities = [entities]
+
+    results = []
+    position = 0
+    for chunks in plans:
+        tagged = []
+        for chunk, keep in chunks:
+            tagged.extend(_tag_words(chunk, keep, entities[position]))
+            position += 1
+        results.append(model.prediction_to_text(tagged) if tagged else '')
+    return results
+
+@timed('punctuation')
+def punctuate_texts(texts, language_code=None):
+    """
+    Восстанавливает пунктуацию в списке текстов с учетом языка (пакетная обработка).
+    Пустые тексты (например, запись без речи) не передаются в модель.
+    """
+    non_empty = [i for i, text in enumerate(texts) if text and text.strip()]
+    results = ['' for _ in texts]
+    if not non_empty:
+        return results
+    restored = restore_punctuation_batch([texts[i] for i in non_empty])
+    for i, text in zip(non_empty, restored):
+        results[i] = postprocess_punctuation(text, language_code)
+    return results
+
+def punctuate_text(text, language_code=None):
+    """
+    Восстанавливает пунктуацию в тексте с учетом языка.
+    """
+    return punctuate_texts([text], language_code)[0]
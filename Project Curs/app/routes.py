@@ -1,20 +1,22 @@
 # app/routes.py
 # Основные маршруты веб-приложения
 
-from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash
+from flask import Blueprint, Response, request, jsonify, render_template, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
-from app.speech_recognition import recognize_speech
+from app.pipeline import process_translation
+from app.worker_pool import run_inference, PoolBusy, InferenceTimeout
+from app.metrics import registry as metrics_registry
 from app.punctuation import punctuate_text
 from app.translation import translate_text
 from app.accent_config import get_available_languages
-# from app.celery_worker import celery  # Temporarily commented out to avoid circular import
-import uuid
-import os
-import signal
-import sys
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
+import json
+import numpy as np
 
 # Создаём blueprint для маршрутов
 bp = Blueprint('routes', __name__)
+sock = Sock()
 
 
 @bp.route('/')
@@ -34,52 +36,90 @@ def translate():
         target_language = request.form.get('target_language', 'en')  # язык перевода
         mode = request.form.get('mode', 'online')  # по умолчанию онлайн-перевод
 
-        # Распознавание речи с учетом выбранного языка и языка перевода
-        recognized_text = recognize_speech(
-            audio_file, 
-            language_code=source_language,
-            target_language=target_language
+        # Распознавание, пунктуация и перевод (в пуле процессов, если он включён)
+        result = run_inference(
+            process_translation,
+            audio_file.read(),
+            source_language=source_language,
+            target_language=target_language,
+            mode=mode
         )
-        
-        # Определяем, какой язык был использован (если был auto)
-        actual_source_language = source_language
-        if source_language == 'auto':
-            # Если не можем определить, предполагаем русский
-            # В продакшене здесь мог бы быть алгоритм определения языка по тексту
-            for lang in ['ru', 'en', 'de', 'fr']:
-                if recognized_text and any(c in recognized_text.lower() for c in get_language_specific_chars(lang)):
-                    actual_source_language = lang
-                    break
-            if actual_source_language == 'auto':
-                actual_source_language = 'ru'
-
-        # Добавление пунктуации с учетом языка
-        punctuated_text = punctuate_text(recognized_text, language_code=actual_source_language)
 
-        # Перевод текста
-        translated_text = translate_text(punctuated_text, target_language, mode)
-
-        return jsonify({
-            "original": punctuated_text,
-            "translated": translated_text,
-            "source_language": actual_source_language,
-            "target_language": target_language
-        })
+        return jsonify(result)
+    except PoolBusy as e:
+        return jsonify({"error": f"Server busy: {str(e)}"}), 503
+    except InferenceTimeout as e:
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
         print(f"Error: {error_details}")
         return jsonify({"error": f"Processing error: {str(e)}"}), 500
 
-def get_language_specific_chars(lang):
-    """Возвращает характерные символы для определения языка"""
-    lang_chars = {
-        'ru': 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя',
-        'en': 'abcdefghijklmnopqrstuvwxyz',
-        'de': 'äöüß',
-        'fr': 'àâçéèêëîïôùûüÿœæ'
-    }
-    return lang_chars.get(lang, '')
+@sock.route('/stream', bp=bp)
+def stream(ws):
+    """
+    Потоковое распознавание по WebSocket.
+    Клиент отправляет JSON {"type": "start", ...}, затем бинарные фрагменты
+    PCM float32 (моно) и JSON {"type": "stop"}. Сервер отвечает сообщениями
+    {"type": "partial"} по мере распознавания и {"type": "final"} в конце.
+    """
+    from app.streaming import StreamingRecognizer
+
+    recognizer = None
+    options = {}
+    try:
+        while True:
+            message = ws.receive()
+            if isinstance(message, str):
+                data = json.loads(message)
+                if data.get('type') == 'start':
+                    options = data
+                    recognizer = StreamingRecognizer(
+                        language_code=data.get('source_language', 'auto'),
+                        sample_rate=int(data.get('sample_rate', 16000))
+                    )
+                elif data.get('type') == 'stop':
+                    break
+                continue
+
+            if recognizer is None:
+                ws.send(json.dumps({"type": "error", "error": "Stream not started"}))
+                continue
+
+            if recognizer.feed(np.frombuffer(message, dtype=np.float32)):
+                partial = {
+                    "type": "partial",
+                    "text": recognizer.text(),
+                    "source_language": recognizer.language_code
+                }
+                if options.get('translate_partials') and partial["text"]:
+                    partial["translated"] = translate_text(
+                        partial["text"], options.get('target_language', 'en'), options.get('mode', 'online')
+                    )
+                ws.send(json.dumps(partial))
+
+        if recognizer is None:
+            return
+
+        recognized_text = recognizer.finish()
+        source_language = recognizer.language_code
+        target_language = options.get('target_language', 'en')
+        punctuated_text = punctuate_text(recognized_text, language_code=source_language) if recognized_text else ''
+        translated_text = translate_text(punctuated_text, target_language, options.get('mode', 'online')) if punctuated_text else ''
+        ws.send(json.dumps({
+            "type": "final",
+            "original": punctuated_text,
+            "translated": translated_text,
+            "source_language": source_language,
+            "target_language": target_language
+        }))
+    except ConnectionClosed:
+        pass
+    except Exception as e:
+        import traceback
+        print(f"Error: {traceback.format_exc()}")
+        ws.send(json.dumps({"type": "error", "error": f"Processing error: {str(e)}"}))
 
 @bp.route('/register', methods=['GET', 'POST'])
 def register():
@@ -118,38 +158,47 @@ def history():
 
 @bp.route('/translate_async', methods=['POST'])
 def translate_async():
-    from app.tasks import async_translate  # Move import here to avoid circular import
+    from app.tasks import start_translation_pipeline  # Move import here to avoid circular import
     audio_file = request.files['audio']
     source_language = request.form.get('source_language', 'ru')
     target_language = request.form.get('target_language', 'en')
     mode = request.form.get('mode', 'online')
     user_id = current_user.id if current_user.is_authenticated else None
 
-    # Сохраняем временный файл
-    temp_filename = f"temp_{uuid.uuid4().hex}.wav"
-    temp_path = os.path.join('/tmp', temp_filename)
-    audio_file.save(temp_path)
-
-    # Запускаем задачу
-    task = async_translate.delay(temp_path, source_language, target_language, mode, user_id)
+    # Аудио передаётся в задачу содержимым, а не путём к локальному файлу
+    task_id = start_translation_pipeline(audio_file.read(), source_language, target_language, mode, user_id)
 
-    return jsonify({'task_id': task.id}), 202
+    return jsonify({'task_id': task_id}), 202
 
 @bp.route('/task_status/<task_id>')
 def task_status(task_id):
+    from app.celery_worker import celery  # Move import here to avoid circular import
     task = celery.AsyncResult(task_id)
     if task.state == 'PENDING':
         response = {'state': task.state}
+    elif task.state == 'PROGRESS':
+        response = {'state': task.state, **task.info}
     elif task.state == 'SUCCESS':
         response = {'state': task.state, 'result': task.result}
     else:
         response = {'state': task.state, 'info': str(task.info)}
     return jsonify(response)
 
+@bp.route('/metrics')
+def metrics():
+    """
+    Метрики в формате Prometheus. Счётчики относятся к процессу, обработавшему запрос:
+    под gunicorn с несколькими воркерами каждый опрос попадает к одному из них.
+    """
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
 @bp.route('/shutdown', methods=['POST'])
 def shutdown():
     func = request.environ.get('werkzeug.server.shutdown')
-    if func is None:
-        raise RuntimeError('Not running with the Werkzeug Server')
-    func()
-    return 'Server shutting down...'
+    if func is not None:
+        func()
+        return 'Server shutting down...'
+
+    # Рабочий сервер (serve.py) удалённо не останавливается: плавную остановку
+    # выполняет сам gunicorn по SIGTERM от менеджера процессов
+    return jsonify({'error': 'Остановка не поддерживается этим сервером'}), 501
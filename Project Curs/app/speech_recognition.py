@@ -1,19 +1,67 @@
 # app/speech_recognition.py
 
+import hashlib
 import os
-import torch
-import librosa
 import re
+import threading
+import time
 import numpy as np
-from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
-from app.utils import convert_audio
+from collections import Counter
+from app.utils import decode_audio, read_audio_data
 from app.accent_config import get_accent_config, ACCENT_CONFIGS
-from app.audio_processing import preprocess_audio
+from app.audio_processing import (
+    preprocess_waveform, spill_audio, split_on_pauses, detect_voice_activity, VAD_ENABLED, VAD_REASON_EMPTY
+)
+from app.batching import BatchScheduler
+from app.model_registry import ModelRegistry, estimate_model_bytes
+from app.lazy import lazy_import
+from app.inference import build_inference_model, feat_extract_output_lengths
+from app.ctc_decoder import build_decoder, CTC_BEAM_MAX_FORWARD_RATIO
+from app.weights import MMAP_WEIGHTS, load_pretrained, weights_path
+from app.metrics import registry, timed
+from app.cache import LRUCache, DiskCache, RedisCache, TieredCache
+from app.celery_config import broker_url
+
+# torch и transformers импортируются при первом обращении к модели
+torch = lazy_import('torch')
+transformers = lazy_import('transformers')
 
 MODEL_CACHE_DIR = "./models/wav2vec"
 
-# Кэш для хранения загруженных моделей
-loaded_models = {}
+# Каталог для сохранения обработанного аудио на диск (по умолчанию аудио не покидает память)
+AUDIO_SPILL_DIR = os.environ.get('AUDIO_SPILL_DIR')
+
+# Бюджет памяти под модели распознавания (в мегабайтах, 0 — без ограничения)
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get('MODEL_MEMORY_BUDGET_MB', 0))
+# Языки, модели которых загружаются при старте приложения (через запятую; all — все из ACCENT_CONFIGS)
+PRELOAD_LANGUAGES = [
+    lang.strip() for lang in os.environ.get('PRELOAD_LANGUAGES', '').split(',') if lang.strip()
+]
+if PRELOAD_LANGUAGES == ['all']:
+    PRELOAD_LANGUAGES = list(ACCENT_CONFIGS)
+
+# Кэш распознанных текстов по содержимому аудио: memory, disk, redis или none
+TRANSCRIPT_CACHE_BACKEND = os.environ.get('TRANSCRIPT_CACHE_BACKEND', 'memory')
+TRANSCRIPT_CACHE_SIZE = int(os.environ.get('TRANSCRIPT_CACHE_SIZE', 1000))
+TRANSCRIPT_CACHE_TTL = float(os.environ.get('TRANSCRIPT_CACHE_TTL', 7 * 24 * 3600))
+TRANSCRIPT_CACHE_DIR = os.environ.get('TRANSCRIPT_CACHE_DIR', './cache/transcripts')
+TRANSCRIPT_CACHE_REDIS_URL = os.environ.get('TRANSCRIPT_CACHE_REDIS_URL', broker_url)
+
+def create_transcript_cache():
+    """
+    Создаёт кэш распознавания согласно TRANSCRIPT_CACHE_BACKEND.
+    """
+    if TRANSCRIPT_CACHE_BACKEND == 'none':
+        return None
+    memory = LRUCache(max_size=TRANSCRIPT_CACHE_SIZE, ttl=TRANSCRIPT_CACHE_TTL)
+    if TRANSCRIPT_CACHE_BACKEND == 'disk':
+        return TieredCache(memory, DiskCache(TRANSCRIPT_CACHE_DIR, ttl=TRANSCRIPT_CACHE_TTL))
+    if TRANSCRIPT_CACHE_BACKEND == 'redis':
+        shared = RedisCache(TRANSCRIPT_CACHE_REDIS_URL, prefix='transcript:', ttl=TRANSCRIPT_CACHE_TTL)
+        return TieredCache(memory, shared)
+    return TieredCache(memory)
+
+transcript_cache = create_transcript_cache()
 
 def download_model_if_needed(model_id):
     """
@@ -28,34 +76,120 @@ def download_model_if_needed(model_id):
     
     if not os.path.exists(local_model_dir):
         print(f"⏬ Скачиваем wav2vec2 модель для {model_id}...")
-        Wav2Vec2Processor.from_pretrained(model_id, cache_dir=MODEL_CACHE_DIR)
-        Wav2Vec2ForCTC.from_pretrained(model_id, cache_dir=MODEL_CACHE_DIR)
+        transformers.Wav2Vec2Processor.from_pretrained(model_id, cache_dir=MODEL_CACHE_DIR)
+        transformers.Wav2Vec2ForCTC.from_pretrained(model_id, cache_dir=MODEL_CACHE_DIR)
         print("✅ Модель загружена.")
     else:
         print(f"✅ wav2vec2 модель {model_id} найдена локально.")
 
+def load_model_for_language(language_code):
+    """
+    Загружает модель и процессор для указанного языка.
+    """
+    config = get_accent_config(language_code)
+    model_id = config['model_id']
+
+    # Если веса уже отображаются из safetensors, полная модель для проверки не загружается
+    if not (MMAP_WEIGHTS and os.path.exists(weights_path(model_id))):
+        download_model_if_needed(model_id)
+
+    processor = transformers.Wav2Vec2Processor.from_pretrained(model_id, cache_dir=MODEL_CACHE_DIR)
+    # Веса отображаются в память (MMAP_WEIGHTS): процессы узла делят одну копию
+    model = load_pretrained(transformers.Wav2Vec2ForCTC, model_id, cache_dir=MODEL_CACHE_DIR)
+
+    # Движок инференса: eager, quantized (int8), torchscript или onnx
+    backend = config.get('backend', 'eager')
+    model, size_bytes = build_inference_model(model, backend, model_id)
+
+    return {
+        'processor': processor,
+        'model': model,
+        'sample_rate': config['sample_rate'],
+        'backend': backend,
+        'size_bytes': size_bytes,
+        # Пакеты разной длины допустимы, только если экстрактор возвращает маску внимания:
+        # иначе нулевое дополнение меняет нормализацию и вход GroupNorm (например, wav2vec2-base-960h)
+        'batchable': bool(getattr(processor.feature_extractor, 'return_attention_mask', False)),
+        # Лучевой декодер CTC (None — жадное декодирование)
+        'decoder': build_decoder(processor, config)
+    }
+
+def model_language(language_code):
+    """
+    Неподдерживаемые языки используют модель по умолчанию, не дублируя её в реестре.
+    """
+    return language_code if language_code in ACCENT_CONFIGS else 'ru'
+
+def estimate_language_model_bytes(language_code):
+    """
+    Объём модели до загрузки — по размеру файла весов safetensors, если он уже экспортирован.
+    """
+    path = weights_path(get_accent_config(language_code)['model_id'])
+    return os.path.getsize(path) if os.path.exists(path) else None
+
+# Реестр загруженных моделей (LRU с бюджетом памяти)
+model_registry = ModelRegistry(
+    loader=load_model_for_language,
+    sizer=lambda model_data: model_data['size_bytes'] or estimate_model_bytes(model_data['model']),
+    memory_budget=MODEL_MEMORY_BUDGET_MB * 1024 * 1024 if MODEL_MEMORY_BUDGET_MB else None,
+    estimator=estimate_language_model_bytes,
+    normalize=model_language
+)
+
+# Метрики реестра моделей и пакетной обработки
+registry.callback(
+    'synchrony_model_cache_events_total', 'Model registry loads, evictions, hits and misses',
+    lambda: [({'event': event}, model_registry.stats[event]) for event in model_registry.stats],
+    type='counter'
+)
+registry.callback(
+    'synchrony_model_memory_bytes', 'Estimated memory of loaded recognition models',
+    lambda: model_registry.memory_bytes()
+)
+registry.callback(
+    'synchrony_models_loaded', 'Number of loaded recognition models',
+    lambda: len(model_registry.loaded_keys())
+)
+registry.callback(
+    'synchrony_asr_batch_queue_depth', 'Recognition requests waiting for a batch',
+    lambda: [({'language': lang}, scheduler.qsize()) for lang, scheduler in list(batch_schedulers.items())]
+)
+registry.callback(
+    'synchrony_transcript_cache_events_total', 'Transcript cache hits and misses',
+    lambda: [
+        ({'tier': tier, 'event': event}, value)
+        for tier, stats in get_transcript_cache_stats().items()
+        for event, value in stats.items() if event in ('hits', 'misses')
+    ],
+    type='counter'
+)
+CTC_BEAM_FALLBACKS = registry.counter(
+    'synchrony_ctc_beam_fallbacks_total', 'Segments decoded greedily because beam search exceeded its time budget'
+)
+VAD_SKIPPED = registry.counter(
+    'synchrony_vad_skipped_total', 'Uploads skipped before recognition because no speech was found'
+)
+ASR_BATCH_SIZE = registry.histogram(
+    'synchrony_asr_batch_size', 'Number of waveforms per recognition forward pass',
+    buckets=(1, 2, 4, 8, 16, 32)
+)
+
+@timed('get_model')
 def get_model_for_language(language_code):
     """
     Возвращает модель и процессор для указанного языка.
     Если модель еще не загружена, загружает её.
     """
-    if language_code not in loaded_models:
-        config = get_accent_config(language_code)
-        model_id = config['model_id']
-        
-        download_model_if_needed(model_id)
-        
-        processor = Wav2Vec2Processor.from_pretrained(model_id, cache_dir=MODEL_CACHE_DIR)
-        model = Wav2Vec2ForCTC.from_pretrained(model_id, cache_dir=MODEL_CACHE_DIR)
-        model.eval()
-        
-        loaded_models[language_code] = {
-            'processor': processor,
-            'model': model,
-            'sample_rate': config['sample_rate']
-        }
-    
-    return loaded_models[language_code]
+    return model_registry.get(language_code)
+
+def preload_models(languages=None):
+    """
+    Заранее загружает модели для указанных языков (по умолчанию — PRELOAD_LANGUAGES).
+    """
+    languages = PRELOAD_LANGUAGES if languages is None else languages
+    if languages:
+        print(f"⏳ Предзагрузка моделей распознавания: {', '.join(languages)}")
+        model_registry.preload(languages)
 
 def postprocess_text(text, language_code):
     """
@@ -82,96 +216,360 @@ def postprocess_text(text, language_code):
 
     return text
 
-def detect_language(audio_file):
+# Параметры определения языка
+LANGUAGE_ID_CANDIDATES = list(ACCENT_CONFIGS)
+# Длина анализируемого начального окна (в секундах)
+LANGUAGE_ID_WINDOW_SEC = float(os.environ.get('LANGUAGE_ID_WINDOW_SEC', 3.0))
+# Отрыв по уверенности, после которого остальные языки не проверяются
+LANGUAGE_ID_MARGIN = float(os.environ.get('LANGUAGE_ID_MARGIN', 0.15))
+# Минимальная уверенность лидера для досрочного завершения
+LANGUAGE_ID_MIN_CONFIDENCE = float(os.environ.get('LANGUAGE_ID_MIN_CONFIDENCE', 0.8))
+
+DEFAULT_SAMPLE_RATE = 16000
+
+# Максимальная длина фрагмента, на которые делится длинное аудио (в секундах)
+MAX_SEGMENT_SEC = float(os.environ.get('MAX_SEGMENT_SEC', 20.0))
+
+# Пакетная обработка параллельных запросов (1 — без объединения в пакеты)
+ASR_BATCH_MAX_SIZE = int(os.environ.get('ASR_BATCH_MAX_SIZE', 8))
+# Максимальное ожидание дополнительных запросов в пакет (мс)
+ASR_BATCH_MAX_WAIT_MS = float(os.environ.get('ASR_BATCH_MAX_WAIT_MS', 10))
+
+# Планировщики пакетов по языкам
+batch_schedulers = {}
+batch_schedulers_lock = threading.Lock()
+
+# Сколько раз определялся каждый язык: часто встречающиеся языки проверяются первыми
+detected_language_counts = Counter()
+
+@timed('forward')
+def compute_logits(model_data, waveform):
     """
-    Пытается определить язык аудио, проверяя распознавание на разных языках
-    и возвращая наиболее вероятный.
+    Прогоняет waveform через модель и возвращает логиты CTC.
     """
-    # Временный путь для конвертированного файла
-    temp_path = convert_audio(audio_file)
-    
+    processor = model_data['processor']
+    model = model_data['model']
+    inputs = processor(waveform, sampling_rate=model_data['sample_rate'], return_tensors="pt", padding=True)
+    with torch.no_grad():
+        return model(**inputs).logits
+
+def compute_logits_batch(model_data, waveforms):
+    """
+    Прогоняет пакет сигналов разной длины через модель за один проход.
+    Возвращает список логитов, обрезанных до длины каждого сигнала.
+    """
+    if len(waveforms) == 1 or not model_data.get('batchable', False):
+        ASR_BATCH_SIZE.observe(1)
+        return [compute_logits(model_data, waveform) for waveform in waveforms]
+
+    ASR_BATCH_SIZE.observe(len(waveforms))
+    logits = compute_logits(model_data, list(waveforms))
+    lengths = feat_extract_output_lengths(
+        model_data['model'].config, torch.tensor([len(waveform) for waveform in waveforms])
+    )
+    return [logits[i:i + 1, :int(length)] for i, length in enumerate(lengths)]
+
+def infer_segment_logits(language_code, waveform, segments):
+    """
+    Возвращает логиты для каждого фрагмента сигнала.
+    Фрагменты отправляются группами не больше размера пакета, чтобы объём памяти
+    не зависел от длины записи.
+    """
+    if not batching_enabled(language_code):
+        return [infer_logits(language_code, waveform[start:end]) for start, end in segments]
+
+    scheduler = get_batch_scheduler(language_code)
+    results = []
+    for i in range(0, len(segments), ASR_BATCH_MAX_SIZE):
+        futures = [
+            scheduler.submit(waveform[start:end])
+            for start, end in segments[i:i + ASR_BATCH_MAX_SIZE]
+        ]
+        results.extend(future.result() for future in futures)
+    return results
+
+def get_batch_scheduler(language_code):
+    """
+    Возвращает планировщик пакетной обработки для модели указанного языка.
+    """
+    if language_code not in ACCENT_CONFIGS:
+        language_code = 'ru'
+    with batch_schedulers_lock:
+        if language_code not in batch_schedulers:
+            batch_schedulers[language_code] = BatchScheduler(
+                lambda waveforms: compute_logits_batch(get_model_for_language(language_code), waveforms),
+                max_batch_size=ASR_BATCH_MAX_SIZE,
+                max_wait_ms=ASR_BATCH_MAX_WAIT_MS,
+                name=f"asr-{language_code}"
+            )
+        return batch_schedulers[language_code]
+
+def batching_enabled(language_code):
+    """
+    Объединять ли запросы к модели языка в пакеты: только при ASR_BATCH_MAX_SIZE > 1
+    и для моделей с маской внимания, у которых результат не зависит от дополнения.
+    """
+    return ASR_BATCH_MAX_SIZE > 1 and get_model_for_language(language_code)['batchable']
+
+def infer_logits(language_code, waveform):
+    """
+    Возвращает логиты модели указанного языка для сигнала.
+    Параллельные запросы к одной модели объединяются в пакеты, если модель это допускает.
+    """
+    if batching_enabled(language_code):
+        return get_batch_scheduler(language_code).submit(waveform).result()
+    return compute_logits(get_model_for_language(language_code), waveform)
+
+def decode_logits(processor, logits):
+    """
+    Жадное декодирование логитов CTC в текст.
+    """
+    predicted_ids = torch.argmax(logits, dim=-1)
+    return processor.batch_decode(predicted_ids)[0]
+
+def beam_deadline(forward_s):
+    """
+    Срок лучевого поиска: не дольше CTC_BEAM_MAX_FORWARD_RATIO от времени прямого прохода.
+    """
+    if forward_s is None or CTC_BEAM_MAX_FORWARD_RATIO <= 0:
+        return None
+    return time.perf_counter() + CTC_BEAM_MAX_FORWARD_RATIO * forward_s
+
+@timed('ctc_decoding')
+def decode_segments(model_data, segment_logits, forward_s=None):
+    """
+    Декодирует логиты фрагментов: лучевым поиском в пуле потоков, если для языка
+    настроен декодер, иначе жадно. Фрагменты, которые лучевой поиск не успел
+    декодировать за бюджет (доля forward_s — времени прямого прохода), декодируются жадно.
+    """
+    decoder = model_data.get('decoder')
+    if decoder is None:
+        return [decode_logits(model_data['processor'], logits) for logits in segment_logits]
+    texts = decoder.decode_batch([logits[0].numpy() for logits in segment_logits], beam_deadline(forward_s))
+    for i, text in enumerate(texts):
+        if text is None:
+            CTC_BEAM_FALLBACKS.inc()
+            texts[i] = decode_logits(model_data['processor'], segment_logits[i])
+    return texts
+
+def logits_confidence(logits):
+    """
+    Средняя по кадрам максимальная вероятность символа — оценка уверенности модели.
+    """
+    probs = torch.nn.functional.softmax(logits, dim=-1)
+    return torch.mean(torch.max(probs, dim=-1).values).item()
+
+@timed('language_detection')
+def detect_language(waveform, sample_rate=DEFAULT_SAMPLE_RATE):
+    """
+    Определяет язык по короткому начальному окну аудио.
+    Языки проверяются по очереди (сначала наиболее частые); проверка прекращается,
+    как только лидер уверенно опережает остальных.
+    :return: (код языка, логиты победившей модели или None).
+        Логиты возвращаются, только если окно покрывает всё аудио —
+        тогда их можно сразу декодировать без повторного прогона модели.
+    """
+    window = waveform[:int(LANGUAGE_ID_WINDOW_SEC * sample_rate)]
+    covers_all = len(window) == len(waveform)
+
+    candidates = sorted(
+        LANGUAGE_ID_CANDIDATES,
+        key=lambda lang: -detected_language_counts[lang]
+    )
+
     try:
-        # Предобработка аудио только один раз
-        enhanced_path = preprocess_audio(temp_path)
-        
-        languages = ['ru', 'en', 'de', 'fr']
         confidence_scores = {}
-        
-        for lang in languages:
-            model_data = get_model_for_language(lang)
-            processor = model_data['processor']
-            model = model_data['model']
-            sample_rate = model_data['sample_rate']
-            
-            # Загрузка и обработка аудио
-            waveform, sr = librosa.load(enhanced_path, sr=sample_rate, mono=True)
-            waveform = librosa.util.normalize(waveform)
-            
-            # Распознавание
-            inputs = processor(waveform, sampling_rate=sample_rate, return_tensors="pt", padding=True)
-            with torch.no_grad():
-                outputs = model(**inputs)
-            
-            # Расчет уверенности модели
-            logits = outputs.logits
-            probs = torch.nn.functional.softmax(logits, dim=-1)
-            confidence = torch.mean(torch.max(probs, dim=-1).values).item()
-            confidence_scores[lang] = confidence
-            
+        window_logits = {}
+
+        for lang in candidates:
+            logits = infer_logits(lang, window)
+            confidence_scores[lang] = logits_confidence(logits)
+            window_logits[lang] = logits
+
+            if len(confidence_scores) >= 2:
+                best, second = sorted(confidence_scores.values(), reverse=True)[:2]
+                if best >= LANGUAGE_ID_MIN_CONFIDENCE and best - second >= LANGUAGE_ID_MARGIN:
+                    break
+
         # Определяем язык с наивысшей уверенностью
         most_confident_lang = max(confidence_scores, key=confidence_scores.get)
-        return most_confident_lang, enhanced_path
-        
+        detected_language_counts[most_confident_lang] += 1
+        return most_confident_lang, window_logits[most_confident_lang] if covers_all else None
+
     except Exception as e:
         print(f"Ошибка при определении языка: {str(e)}")
-        return 'ru', temp_path  # Возвращаем русский по умолчанию в случае ошибки
+        return 'ru', None  # Возвращаем русский по умолчанию в случае ошибки
+
+def read_audio_bytes(audio_file):
+    """
+    Читает содержимое загруженного аудио для хеширования.
+    :return: (байты или None для сигнала NumPy, объект для дальнейшего декодирования)
+    """
+    if isinstance(audio_file, np.ndarray):
+        return None, audio_file
+    data = read_audio_data(audio_file)
+    return data, data
+
+def transcript_cache_key(digest, language_code):
+    """
+    Ключ кэша распознавания: хеш содержимого, язык и модели, которые участвуют в распознавании
+    (для 'auto' — все модели-кандидаты определения языка).
+    """
+    languages = LANGUAGE_ID_CANDIDATES if language_code == 'auto' else [language_code]
+    models = ','.join(
+        '/'.join([
+            get_accent_config(lang)['model_id'],
+            get_accent_config(lang).get('backend', 'eager'),
+            get_accent_config(lang).get('decoder', 'greedy'),
+            os.path.basename(get_accent_config(lang).get('lm_path') or '')
+        ])
+        for lang in languages
+    )
+    return f"{language_code}:{models}:{digest}"
+
+def get_transcript_cache_stats():
+    return transcript_cache.get_stats() if transcript_cache is not None else {}
+
+def decode_waveform(audio_file, sample_rate=DEFAULT_SAMPLE_RATE):
+    """
+    Декодирует аудио в память без улучшения.
+    :param audio_file: Путь к файлу, байты, файловый объект или уже декодированный
+        моно-сигнал NumPy с частотой sample_rate
+    :return: float32-сигнал с частотой sample_rate, принадлежащий вызывающему коду
+    """
+    if isinstance(audio_file, np.ndarray):
+        # Предобработка идёт на месте, поэтому массив вызывающего кода копируется
+        return np.array(audio_file, dtype=np.float32)
+    return decode_audio(audio_file, target_sr=sample_rate)
+
+def enhance_waveform(waveform, sample_rate=DEFAULT_SAMPLE_RATE):
+    """
+    Улучшает декодированный сигнал (на месте) и при необходимости сохраняет его на диск.
+    """
+    waveform = preprocess_waveform(waveform, sample_rate, target_sr=sample_rate)
+
+    # Сохранение на диск только по запросу (для отладки)
+    if AUDIO_SPILL_DIR:
+        spill_audio(waveform, sample_rate, AUDIO_SPILL_DIR)
+
+    return waveform
+
+def load_waveform(audio_file, sample_rate=DEFAULT_SAMPLE_RATE):
+    """
+    Декодирует и улучшает аудио в памяти.
+    :return: Нормализованный float32-сигнал с частотой sample_rate
+    """
+    return enhance_waveform(decode_waveform(audio_file, sample_rate), sample_rate)
+
+def empty_transcription(language_code, reason):
+    """
+    Пустой результат распознавания без обращения к модели; reason — код причины (VAD_REASON_*).
+    """
+    VAD_SKIPPED.inc(reason=reason)
+    return {'text': '', 'language': language_code, 'segments': [], 'reason': reason}
+
+def transcribe(audio_file, language_code='auto', target_language=None):
+    """
+    Распознаёт речь из аудиофайла.
+    :param audio_file: Путь к аудиофайлу, файловый объект или сигнал NumPy (16 кГц, моно)
+    :param language_code: Код языка (ru, en, de, fr) или 'auto' для автоопределения
+    :param target_language: Опциональный код языка назначения для улучшения распознавания
+    :return: Словарь {'text': распознанный текст, 'language': язык распознавания,
+        'segments': [{'start': с, 'end': с, 'text': текст фрагмента}, ...]}.
+        Если речь не найдена, текст пуст, а ключ 'reason' содержит код причины.
+    """
+    if language_code != 'auto' and language_code not in ACCENT_CONFIGS:
+        language_code = 'ru'
+
+    # Повторная загрузка того же аудио отдаётся из кэша до декодирования и инференса.
+    # Ключ — хеш исходных байтов (или PCM для сигнала NumPy), язык и идентификатор модели.
+    digest = None
+    if transcript_cache is not None:
+        data, audio_file = read_audio_bytes(audio_file)
+        if data is None:
+            data = np.ascontiguousarray(audio_file, dtype=np.float32).tobytes()
+        digest = hashlib.sha256(data).hexdigest()
+        cached = transcript_cache.get(transcript_cache_key(digest, language_code))
+        if cached is not None:
+            return cached
+
+    result = _transcribe_uncached(audio_file, language_code)
+
+    if digest is not None:
+        transcript_cache.set(transcript_cache_key(digest, language_code), result)
+        if language_code == 'auto':
+            # Определённый язык запоминается: тот же файл с явно указанным языком тоже попадёт в кэш
+            transcript_cache.set(transcript_cache_key(digest, result['language']), result)
+    return result
+
+def _transcribe_uncached(audio_file, language_code):
+    if language_code == 'auto':
+        sample_rate = DEFAULT_SAMPLE_RATE
+    else:
+        sample_rate = get_accent_config(language_code)['sample_rate']
+
+    # Путь или файловый объект читается один раз, чтобы пустую загрузку
+    # распознать до декодирования, а не получить ошибку декодера
+    # (отсутствующий файл по-прежнему отклоняет decode_audio)
+    if not isinstance(audio_file, np.ndarray) and audio_file is not None and audio_file != '':
+        audio_file = read_audio_data(audio_file)
+    if VAD_ENABLED and isinstance(audio_file, bytes) and not audio_file:
+        return empty_transcription(language_code, VAD_REASON_EMPTY)
+
+    # Декодирование и предобработка выполняются один раз, сигнал остаётся в памяти
+    waveform = decode_waveform(audio_file, sample_rate)
+
+    # Тишина и случайные нажатия не проходят ресемплинг, улучшение и прогон модели
+    if VAD_ENABLED:
+        reason = detect_voice_activity(waveform, sample_rate)
+        if reason is not None:
+            return empty_transcription(language_code, reason)
+
+    waveform = enhance_waveform(waveform, sample_rate)
+
+    logits = None
+    started = time.perf_counter()
+    if language_code == 'auto':
+        # Автоматическое определение языка
+        language_code, logits = detect_language(waveform, sample_rate)
+        print(f"Определен язык: {language_code}")
+
+    model_data = get_model_for_language(language_code)
+
+    # Распознавание речи (логиты определения языка используются повторно, если есть).
+    # Длинное аудио делится по паузам на ограниченные фрагменты.
+    if logits is not None:
+        segments = [(0, len(waveform))]
+        segment_logits = [logits]
+    else:
+        segments = split_on_pauses(waveform, sample_rate, max_segment_sec=MAX_SEGMENT_SEC)
+        segment_logits = infer_segment_logits(language_code, waveform, segments)
+    # Время прямого прохода задаёт бюджет лучевого поиска
+    forward_s = time.perf_counter() - started
+
+    segment_results = []
+    for (start, end), text in zip(segments, decode_segments(model_data, segment_logits, forward_s)):
+        text = ' '.join(text.split())
+        if text:
+            segment_results.append({
+                'start': round(start / sample_rate, 2),
+                'end': round(end / sample_rate, 2),
+                'text': text
+            })
+
+    # Постобработка текста
+    recognized_text = postprocess_text(
+        ' '.join(segment['text'] for segment in segment_results), language_code
+    )
+
+    return {'text': recognized_text, 'language': language_code, 'segments': segment_results}
 
 def recognize_speech(audio_file, language_code='auto', target_language=None):
     """
     Распознаёт речь из аудиофайла и возвращает текст.
-    :param audio_file: Путь к аудиофайлу
+    :param audio_file: Путь к аудиофайлу, файловый объект или сигнал NumPy (16 кГц, моно)
     :param language_code: Код языка (ru, en, de, fr) или 'auto' для автоопределения
     :param target_language: Опциональный код языка назначения для улучшения распознавания
     :return: Распознанный текст
     """
-    # Конвертируем аудио в нужный формат
-    temp_path = convert_audio(audio_file)
-    enhanced_path = None
-    
-    try:
-        if language_code == 'auto':
-            # Автоматическое определение языка
-            language_code, enhanced_path = detect_language(temp_path)
-            print(f"Определен язык: {language_code}")
-        
-        model_data = get_model_for_language(language_code)
-        processor = model_data['processor']
-        model = model_data['model']
-        sample_rate = model_data['sample_rate']
-
-        if not enhanced_path:
-            # Предварительная обработка аудио
-            enhanced_path = preprocess_audio(temp_path, target_sr=sample_rate)
-        
-        # Загрузка и обработка аудио
-        waveform, sr = librosa.load(enhanced_path, sr=sample_rate, mono=True)
-        waveform = librosa.util.normalize(waveform)
-
-        # Распознавание речи
-        inputs = processor(waveform, sampling_rate=sample_rate, return_tensors="pt", padding=True)
-        with torch.no_grad():
-            logits = model(**inputs).logits
-        predicted_ids = torch.argmax(logits, dim=-1)
-        recognized_text = processor.batch_decode(predicted_ids)[0]
-        
-        # Постобработка текста
-        recognized_text = postprocess_text(recognized_text, language_code)
-        
-        return recognized_text
-        
-    finally:
-        # Удаление временных файлов
-        if os.path.exists(temp_path):
-            os.unlink(temp_path)
-        if enhanced_path and os.path.exists(enhanced_path):
-            os.unlink(enhanced_path)
+    return transcribe(audio_file, language_code, target_language)['text']
@@ -0,0 +1,172 @@
+# app/streaming.py
+# Потоковое распознавание речи: перекрывающиеся окна и склейка логитов CTC
+
+import os
+import time
+import numpy as np
+import librosa
+import torch
+from app.ctc_decoder import DecodeBudgetExceeded
+from app.speech_recognition import (
+    DEFAULT_SAMPLE_RATE, LANGUAGE_ID_WINDOW_SEC, CTC_BEAM_FALLBACKS,
+    beam_deadline, detect_language, get_model_for_language, infer_logits, postprocess_text
+)
+
+# Длина окна, логиты которого фиксируются за один шаг (в секундах)
+STREAM_CHUNK_SEC = float(os.environ.get('STREAM_CHUNK_SEC', 2.0))
+# Контекст слева и справа от окна, логиты которого отбрасываются (в секундах)
+STREAM_STRIDE_SEC = float(os.environ.get('STREAM_STRIDE_SEC', 0.5))
+
+# Сколько отсчётов аудио приходится на один кадр логитов wav2vec2
+SAMPLES_PER_FRAME = 320
+
+
+def _align(seconds, sample_rate):
+    # Границы окон выравниваются по кадрам, чтобы логиты склеивались без сдвига
+    return max(1, int(seconds * sample_rate) // SAMPLES_PER_FRAME) * SAMPLES_PER_FRAME
+
+
+class StreamingRecognizer:
+    """
+    Инкрементальное распознавание потока аудио.
+
+    Модель прогоняется по окнам [начало - stride, начало + chunk + stride];
+    из каждого окна сохраняются только логиты центральной части, поэтому
+    слова на границах окон распознаются с контекстом с обеих сторон.
+    Хранятся только хвост аудио, нужный следующему окну, текст завершённых слов
+    и предсказанные id символов после последнего разделителя слов: каждое слово
+    декодируется один раз, а не при каждом обновлении заново вся история.
+    Если для языка настроен лучевой декодер, завершённые слова декодируются им
+    по сохранённым логитам (с контекстом языковой модели), как и в transcribe.
+    """
+
+    def __init__(self, language_code='auto', sample_rate=DEFAULT_SAMPLE_RATE,
+                 chunk_sec=STREAM_CHUNK_SEC, stride_sec=STREAM_STRIDE_SEC):
+        self.language_code = language_code
+        self.input_sample_rate = sample_rate
+        self.sample_rate = DEFAULT_SAMPLE_RATE
+        self.chunk = _align(chunk_sec, self.sample_rate)
+        self.stride = _align(stride_sec, self.sample_rate)
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.buffer_offset = 0   # абсолютный номер первого отсчёта в buffer
+        self.committed_until = 0  # до какого отсчёта логиты окончательные
+        self.decoded_words = []   # текст завершённых слов (по зафиксированным окнам)
+        self.predicted_ids = []   # id символов после последнего разделителя слов
+        self.pending_logits = []  # логиты тех же кадров (только для лучевого декодера)
+        self.pending_forward_s = 0.0  # время прямого прохода этих кадров — бюджет поиска
+
+    def feed(self, samples):
+        """
+        Добавляет фрагмент аудио (float32, моно). Возвращает True,
+        если распознанный текст обновился.
+        """
+        samples = np.asarray(samples, dtype=np.float32)
+        if self.input_sample_rate != self.sample_rate:
+            samples = librosa.resample(samples, orig_sr=self.input_sample_rate, target_sr=self.sample_rate)
+        self.buffer = np.concatenate([self.buffer, samples])
+
+        if self.language_code == 'auto':
+            window = int(LANGUAGE_ID_WINDOW_SEC * self.sample_rate)
+            if self.buffer_offset + len(self.buffer) < window:
+                return False
+            self.language_code, _ = detect_language(self.buffer[:window], self.sample_rate)
+
+        updated = False
+        while self._available_until() >= self.committed_until + self.chunk + self.stride:
+            self._commit(self.committed_until + self.chunk, right_context=self.stride)
+            updated = True
+        return updated
+
+    def finish(self):
+        """
+        Обрабатывает остаток аудио. Возвращает итоговый текст.
+        """
+        if self._available_until() == 0:
+            return ''
+        if self.language_code == 'auto':
+            self.language_code, _ = detect_language(self.buffer, self.sample_rate)
+        end = self._available_until()
+        # Остаток короче кадра модель не обработает
+        if end - self.committed_until >= SAMPLES_PER_FRAME:
+            self._commit(end, right_context=0)
+        return self.text()
+
+    def text(self):
+        """
+        Текущий распознанный текст (по зафиксированным окнам).
+        """
+        if self.language_code == 'auto':
+            return ''
+        tail = self._decode_pending(len(self.predicted_ids), final=True) if self.predicted_ids else ''
+        text = ' '.join(part for part in (*self.decoded_words, tail) if part)
+        return postprocess_text(text, self.language_code) if text else ''
+
+    def _decoder(self):
+        return get_model_for_language(self.language_code).get('decoder')
+
+    def _decode_ids(self, ids):
+        processor = get_model_for_language(self.language_code)['processor']
+        return processor.batch_decode(torch.tensor([ids]))[0].strip()
+
+    def _decode_pending(self, count, final):
+        """
+        Декодирует первые count кадров после последнего разделителя слов:
+        лучевым декодером языка (если он настроен и укладывается в бюджет) или жадно.
+        """
+        decoder = self._decoder()
+        if decoder is not None:
+            logits = np.concatenate(self.pending_logits)
+            # Контекст языковой модели — последние слова уже распознанного текста
+            order = decoder.lm.order if decoder.lm is not None else 1
+            context = decoder.initial_context(' '.join(self.decoded_words[-order:]))
+            deadline = beam_deadline(self.pending_forward_s * count / len(logits))
+            try:
+                return decoder.decode(logits[:count], context=context, final=final, deadline=deadline).strip()
+            except DecodeBudgetExceeded:
+                CTC_BEAM_FALLBACKS.inc()
+        return self._decode_ids(self.predicted_ids[:count])
+
+    def _flush_words(self):
+        """
+        Декодирует id до последнего разделителя слов и убирает их из predicted_ids.
+        После разделителя идёт другой id, поэтому схлопывание повторов CTC
+        не затрагивает границу и текст совпадает с декодированием всей истории.
+        """
+        tokenizer = get_model_for_language(self.language_code)['processor'].tokenizer
+        delimiter_id = tokenizer.convert_tokens_to_ids(tokenizer.word_delimiter_token)
+        for index in range(len(self.predicted_ids) - 1, -1, -1):
+            if self.predicted_ids[index] == delimiter_id:
+                words = self._decode_pending(index + 1, final=False)
+                if words:
+                    self.decoded_words.append(words)
+                if self.pending_logits:
+                    logits = np.concatenate(self.pending_logits)
+                    self.pending_forward_s *= (len(logits) - index - 1) / len(logits)
+                    self.pending_logits = [logits[index + 1:]]
+                del self.predicted_ids[:index + 1]
+                return
+
+    def _available_until(self):
+        return self.buffer_offset + len(self.buffer)
+
+    def _commit(self, until, right_context):
+        start = max(0, self.committed_until - self.stride)
+        end = min(until + right_context, self._available_until())
+        window = self.buffer[start - self.buffer_offset:end - self.buffer_offset]
+
+        started = time.perf_counter()
+        logits = infer_logits(self.language_code, window)
+        forward_s = time.perf_counter() - started
+        first = (self.committed_until - start) // SAMPLES_PER_FRAME
+        last = first + (until - self.committed_until) // SAMPLES_PER_FRAME
+        self.predicted_ids.extend(torch.argmax(logits[0, first:last], dim=-1).tolist())
+        if self._decoder() is not None:
+            self.pending_logits.append(logits[0, first:last].numpy())
+            self.pending_forward_s += forward_s
+        self.committed_until = until
+        self._flush_words()
+
+        # Освобождаем аудио, которое больше не понадобится как левый контекст
+        keep_from = max(0, self.committed_until - self.stride)
+        self.buffer = self.buffer[keep_from - self.buffer_offset:]
+        self.buffer_offset = keep_from
@@ -1,16 +1,78 @@
+# app/tasks.py
+# Распределённый конвейер Celery: распознавание → пунктуация → перевод.
+# Этапы — отдельные задачи в цепочке; их можно направлять в разные очереди (см. celery_config.task_routes)
+
+import base64
+import uuid
+from contextlib import contextmanager
+from celery import chain
 from .celery_worker import celery
-from app.speech_recognition import recognize_speech
+from app.speech_recognition import transcribe
 from app.punctuation import punctuate_text
 from app.translation import translate_text
 
+STAGES = ['recognition', 'punctuation', 'translation']
+
+@contextmanager
+def pipeline_stage(pipeline_id, stage):
+    """
+    Сообщает о начале этапа в состоянии конвейера (PROGRESS), а при ошибке
+    помечает весь конвейер как FAILURE, чтобы /task_status не ждал вечно.
+    """
+    celery.backend.store_result(pipeline_id, {
+        'stage': stage,
+        'step': STAGES.index(stage) + 1,
+        'total': len(STAGES)
+    }, 'PROGRESS')
+    try:
+        yield
+    except Exception as e:
+        celery.backend.store_result(pipeline_id, e, 'FAILURE')
+        raise
+
+@celery.task
+def recognize_task(audio_b64, source_language, pipeline_id):
+    # Аудио передаётся содержимым, поэтому воркер может работать на другом узле
+    with pipeline_stage(pipeline_id, 'recognition'):
+        recognition = transcribe(base64.b64decode(audio_b64), language_code=source_language)
+        result = {
+            'text': recognition['text'],
+            'language': recognition['language'],
+            'segments': recognition['segments']
+        }
+        if 'reason' in recognition:
+            result['reason'] = recognition['reason']
+        return result
+
+@celery.task
+def punctuate_task(recognition, pipeline_id):
+    with pipeline_stage(pipeline_id, 'punctuation'):
+        return dict(recognition, text=punctuate_text(recognition['text'], language_code=recognition['language']))
+
 @celery.task
-def async_translate(audio_path, source_language, target_language, mode, user_id=None):
-    # Здесь audio_path — путь к сохранённому аудиофайлу
-    with open(audio_path, 'rb') as f:
-        recognized_text = recognize_speech(f, language_code=source_language)
-    punctuated_text = punctuate_text(recognized_text, language_code=source_language)
-    translated_text = translate_text(punctuated_text, target_language, mode)
-    return {
-        'original': punctuated_text,
-        'translated': translated_text
-    } 
\ No newline at end of file
+def translate_task(punctuated, target_language, mode, pipeline_id):
+    with pipeline_stage(pipeline_id, 'translation'):
+        result = {
+            'original': punctuated['text'],
+            'translated': translate_text(punctuated['text'], target_language, mode),
+            'source_language': punctuated['language'],
+            'target_language': target_language,
+            'segments': punctuated['segments']
+        }
+        if 'reason' in punctuated:
+            result['reason'] = punctuated['reason']
+        return result
+
+def start_translation_pipeline(audio_bytes, source_language, target_language, mode, user_id=None):
+    """
+    Запускает цепочку задач. Возвращает id конвейера: это id последней задачи,
+    по нему /task_status показывает текущий этап и итоговый результат.
+    """
+    pipeline_id = uuid.uuid4().hex
+    audio_b64 = base64.b64encode(audio_bytes).decode('ascii')
+    chain(
+        recognize_task.s(audio_b64, source_language, pipeline_id=pipeline_id),
+        punctuate_task.s(pipeline_id=pipeline_id),
+        translate_task.s(target_language, mode, pipeline_id=pipeline_id).set(task_id=pipeline_id)
+    ).apply_async()
+    return pipeline_id
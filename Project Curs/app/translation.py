@@ -3,14 +3,70 @@
 
 import os
 import requests
-from argostranslate import package, translate
-from googletrans import Translator
+import hashlib
 import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.online_translation import OnlineTranslationClient
+from app.cache import LRUCache, RedisCache, TieredCache
+from app.celery_config import broker_url
+from app.lazy import lazy_import
+from app.metrics import registry, timed
+
+# Argos (и CTranslate2) импортируются при первом локальном переводе
+package = lazy_import('argostranslate.package')
+translate = lazy_import('argostranslate.translate')
 
 # Настройка логирования
 logging.basicConfig(level=logging.DEBUG)
 
-translator = Translator()
+# Пул соединений для онлайн-перевода
+online_client = OnlineTranslationClient()
+
+# Кэш переводов: 'memory' — LRU в процессе, 'redis' — LRU + общий кэш в Redis, 'none' — отключён
+TRANSLATION_CACHE_BACKEND = os.environ.get('TRANSLATION_CACHE_BACKEND', 'memory')
+TRANSLATION_CACHE_SIZE = int(os.environ.get('TRANSLATION_CACHE_SIZE', 10000))
+TRANSLATION_CACHE_TTL = float(os.environ.get('TRANSLATION_CACHE_TTL', 24 * 3600))
+# По умолчанию используется тот же Redis, что и брокер Celery
+TRANSLATION_CACHE_REDIS_URL = os.environ.get('TRANSLATION_CACHE_REDIS_URL', broker_url)
+
+def create_translation_cache():
+    """
+    Создаёт кэш переводов согласно TRANSLATION_CACHE_BACKEND.
+    """
+    if TRANSLATION_CACHE_BACKEND == 'none':
+        return None
+    memory = LRUCache(max_size=TRANSLATION_CACHE_SIZE, ttl=TRANSLATION_CACHE_TTL)
+    if TRANSLATION_CACHE_BACKEND == 'redis':
+        shared = RedisCache(TRANSLATION_CACHE_REDIS_URL, prefix='translation:', ttl=TRANSLATION_CACHE_TTL)
+        return TieredCache(memory, shared)
+    return TieredCache(memory)
+
+translation_cache = create_translation_cache()
+
+registry.callback(
+    'synchrony_translation_cache_events_total', 'Translation cache hits and misses',
+    lambda: [
+        ({'tier': tier, 'event': event}, value)
+        for tier, stats in get_translation_cache_stats().items()
+        for event, value in stats.items() if event in ('hits', 'misses')
+    ],
+    type='counter'
+)
+registry.callback(
+    'synchrony_online_translation_events_total', 'Online translation requests, retries, coalesced calls and errors',
+    lambda: [({'event': event}, value) for event, value in online_client.get_stats().items() if event != 'in_flight'],
+    type='counter'
+)
+
+def translation_cache_key(text, source_language, target_language, mode):
+    """
+    Ключ кэша: нормализованный текст, языковая пара и режим перевода.
+    """
+    normalized = ' '.join(text.split())
+    digest = hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+    return f"{mode}:{source_language}:{target_language}:{digest}"
 
 MODEL_DIR = "./models"
 MODEL_URLS = {
@@ -19,6 +75,28 @@ MODEL_URLS = {
     # Можно добавить другие пары, если появятся
 }
 
+# Пары для локального перевода, загружаемые при старте приложения (например, "ru-en,en-ru")
+PRELOAD_TRANSLATION_PAIRS = [
+    tuple(pair.strip().split('-', 1))
+    for pair in os.environ.get('PRELOAD_TRANSLATION_PAIRS', '').split(',') if '-' in pair
+]
+
+# Длинные тексты переводятся группами предложений не длиннее LOCAL_TRANSLATION_BATCH_CHARS символов
+LOCAL_TRANSLATION_BATCH_CHARS = int(os.environ.get('LOCAL_TRANSLATION_BATCH_CHARS', 1000))
+# Число потоков для параллельного перевода групп (1 — последовательно)
+LOCAL_TRANSLATION_WORKERS = int(os.environ.get('LOCAL_TRANSLATION_WORKERS', 2))
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…])\s+')
+
+# Потоки создаются пулом только при первом использовании
+local_translation_executor = ThreadPoolExecutor(
+    max_workers=LOCAL_TRANSLATION_WORKERS, thread_name_prefix='argos'
+) if LOCAL_TRANSLATION_WORKERS > 1 else None
+
+# Готовые объекты перевода Argos по языковым парам
+local_translations = {}
+local_translations_lock = threading.Lock()
+
 def ensure_model_installed(from_code, to_code):
     """
     Проверяет, установлена ли модель перевода. Если нет — скачивает и устанавливает.
@@ -62,37 +140,137 @@ def zipfile_is_valid(path):
     except zipfile.BadZipFile:
         return False
 
+def get_local_translation(from_code, to_code):
+    """
+    Возвращает готовый объект перевода Argos для пары языков.
+    Модель устанавливается и объект создаётся один раз; None — если модель не установлена.
+    """
+    translation = local_translations.get((from_code, to_code))
+    if translation is not None:
+        return translation
+
+    with local_translations_lock:
+        translation = local_translations.get((from_code, to_code))
+        if translation is not None:
+            return translation
+
+        ensure_model_installed(from_code, to_code)
+
+        installed_languages = translate.get_installed_languages()
+        from_lang = next((l for l in installed_languages if l.code == from_code), None)
+        to_lang = next((l for l in installed_languages if l.code == to_code), None)
+        if not (from_lang and to_lang):
+            return None
+
+        translation = from_lang.get_translation(to_lang)
+        local_translations[(from_code, to_code)] = translation
+        return translation
+
+def split_sentences(text):
+    """
+    Делит текст на предложения по знакам конца предложения, расставленным этапом пунктуации.
+    """
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text.strip()) if sentence]
+
+def group_sentences(sentences, max_chars=LOCAL_TRANSLATION_BATCH_CHARS):
+    """
+    Объединяет подряд идущие предложения в группы не длиннее max_chars символов.
+    Предложение длиннее max_chars образует отдельную группу.
+    """
+    groups = []
+    current = []
+    current_len = 0
+    for sentence in sentences:
+        if current and current_len + len(sentence) + 1 > max_chars:
+            groups.append(' '.join(current))
+            current = []
+            current_len = 0
+        current.append(sentence)
+        current_len += len(sentence) + 1
+    if current:
+        groups.append(' '.join(current))
+    return groups
+
+def translate_local_text(translation, text):
+    """
+    Переводит текст локальной моделью. Длинный текст делится на группы предложений,
+    каждая группа переводится одним пакетом CTranslate2; группы переводятся параллельно,
+    а результаты собираются в исходном порядке.
+    """
+    groups = group_sentences(split_sentences(text))
+    if len(groups) <= 1:
+        return translation.translate(text)
+
+    if local_translation_executor is not None:
+        results = local_translation_executor.map(translation.translate, groups)
+    else:
+        results = map(translation.translate, groups)
+    return ' '.join(results)
+
+def preload_translations(pairs=None):
+    """
+    Заранее готовит объекты локального перевода (по умолчанию — PRELOAD_TRANSLATION_PAIRS).
+    """
+    pairs = PRELOAD_TRANSLATION_PAIRS if pairs is None else pairs
+    for from_code, to_code in pairs:
+        try:
+            get_local_translation(from_code, to_code)
+        except Exception as e:
+            logging.error(f"Не удалось подготовить перевод {from_code} → {to_code}: {str(e)}")
+
 def get_supported_offline_pairs():
     """
     Возвращает список поддерживаемых оффлайн-пар для перевода.
     """
     return list(MODEL_URLS.keys())
 
+@timed('translation')
 def translate_text(text, target_language, mode='online'):
+    # Пустой текст (например, запись без речи) не переводится и не кэшируется
+    if not text or not text.strip():
+        return ''
     logging.debug(f"Translating text: {text} to {target_language} using mode: {mode}")
+    source_lang = 'ru' if mode == 'local' else 'auto'  # Локально пока предполагаем только с русского
+
+    key = translation_cache_key(text, source_lang, target_language, mode)
+    if translation_cache is not None:
+        cached = translation_cache.get(key)
+        if cached is not None:
+            logging.debug("Translation cache hit")
+            return cached
+
     try:
-        if mode == 'local':
-            source_lang = 'ru'  # Пока предполагаем только с русского
-            if (source_lang, target_language) not in MODEL_URLS:
-                warning = f"[Внимание] Оффлайн-перевод для пары {source_lang} → {target_language} не поддерживается. Используется онлайн-перевод."
-                logging.warning(warning)
-                result = translator.translate(text, dest=target_language)
-                return f"{warning}\n{result.text}"
-            ensure_model_installed(source_lang, target_language)
-
-            installed_languages = translate.get_installed_languages()
-            from_lang = next((l for l in installed_languages if l.code == source_lang), None)
-            to_lang = next((l for l in installed_languages if l.code == target_language), None)
-
-            if from_lang and to_lang:
-                translation = from_lang.get_translation(to_lang)
-                return translation.translate(text)
-            else:
-                return "Ошибка: локальная модель не установлена."
-        else:
-            result = translator.translate(text, dest=target_language)
-            logging.debug(f"Translation result: {result.text}")
-            return result.text
+        result = _translate_uncached(text, source_lang, target_language, mode)
     except Exception as e:
         logging.error(f"Translation error: {str(e)}")
         return f"Ошибка перевода: {str(e)}"
+
+    # Ошибки не кэшируются
+    if translation_cache is not None and result is not None:
+        translation_cache.set(key, result)
+    return result if result is not None else "Ошибка: локальная модель не установлена."
+
+def _translate_uncached(text, source_lang, target_language, mode):
+    """
+    Выполняет перевод без обращения к кэшу. Возвращает None, если локальная модель не установлена.
+    """
+    if mode == 'local':
+        if (source_lang, target_language) not in MODEL_URLS:
+            warning = f"[Внимание] Оффлайн-перевод для пары {source_lang} → {target_language} не поддерживается. Используется онлайн-перевод."
+            logging.warning(warning)
+            result = online_client.translate(text, target_language)
+            return f"{warning}\n{result}"
+        translation = get_local_translation(source_lang, target_language)
+        if translation is None:
+            return None
+        return translate_local_text(translation, text)
+    else:
+        result = online_client.translate(text, target_language)
+        logging.debug(f"Translation result: {result}")
+        return result
+
+def get_translation_cache_stats():
+    """
+    Возвращает статистику попаданий/промахов кэша переводов.
+    """
+    return translation_cache.get_stats() if translation_cache is not None else {}
@@ -1,24 +1,260 @@
 # app/utils.py
-# Утилитарные функции для обработки аудио
+# Утилитарные функции для обработки аудио: декодирование в память с определением формата
 
-from pydub import AudioSegment
-import tempfile
+import io
 import os
-from pydub.utils import which
+import shutil
+import struct
+import subprocess
+import threading
+from collections import deque
+import numpy as np
+from app.lazy import lazy_import
+from app.metrics import registry, timed
 
-# Указываем путь к ffmpeg
-AudioSegment.converter = which("ffmpeg") or "ffmpeg.exe"
+# Тяжёлые библиотеки импортируются при первом использовании
+sf = lazy_import('soundfile')
+librosa = lazy_import('librosa')
 
-def convert_audio(audio_file):
+# Путь к ffmpeg
+FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY') or shutil.which("ffmpeg") or "ffmpeg.exe"
+# Число заранее запущенных процессов ffmpeg на каждую частоту дискретизации
+FFMPEG_POOL_SIZE = int(os.environ.get('FFMPEG_POOL_SIZE', 2))
+FFMPEG_TIMEOUT = float(os.environ.get('FFMPEG_TIMEOUT', 30))
+
+# Форматы, которые libsndfile декодирует без внешних процессов
+SOUNDFILE_FORMATS = ('wav', 'flac', 'ogg')
+
+AUDIO_DECODED = registry.counter(
+    'synchrony_audio_decoded_total', 'Decoded uploads by container format and decoder'
+)
+
+
+def sniff_format(data):
+    """
+    Определяет контейнер по сигнатуре в начале файла.
+    :return: 'wav', 'flac', 'ogg', 'webm', 'mp3' или None
+    """
+    if data[:4] == b'RIFF' and data[8:12] == b'WAVE':
+        return 'wav'
+    if data[:4] == b'fLaC':
+        return 'flac'
+    if data[:4] == b'OggS':
+        return 'ogg'
+    if data[:4] == b'\x1a\x45\xdf\xa3':  # EBML: webm/mkv
+        return 'webm'
+    if data[:3] == b'ID3' or (len(data) > 1 and data[0] == 0xFF and data[1] & 0xE0 == 0xE0):
+        return 'mp3'
+    return None
+
+
+def read_pcm16_wav(data, target_sr):
+    """
+    Быстрый путь для WAV, который уже имеет нужный формат (PCM16, моно, target_sr):
+    сэмплы берутся прямо из буфера без libsndfile и ресемплинга.
+    :return: Сигнал float32 или None, если файл не подходит или заголовок повреждён
+    (тогда файл декодируется общим путём)
+    """
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        size = struct.unpack_from('<I', data, pos + 4)[0]
+        body = pos + 8
+        if chunk_id == b'fmt ':
+            # Обрезанный или повреждённый заголовок формата
+            if size < 16 or body + 16 > len(data):
+                return None
+            fmt = struct.unpack_from('<HHIIHH', data, body)
+        elif chunk_id == b'data':
+            if fmt is None:
+                return None
+            tag, channels, rate, _, _, bits = fmt
+            if tag != 1 or channels != 1 or bits != 16 or rate != target_sr:
+                return None
+            # Потоковые записи оставляют размер 0 или 0xFFFFFFFF — читаем до конца буфера
+            end = len(data) if size in (0, 0xFFFFFFFF) else min(body + size, len(data))
+            samples = np.frombuffer(data, dtype='<i2', count=(end - body) // 2, offset=body).astype(np.float32)
+            samples *= 1.0 / 32768
+            return samples
+        pos = body + size + (size & 1)
+    return None
+
+
+def read_soundfile(data, target_sr):
+    """
+    Декодирование WAV/FLAC/OGG в процессе через libsndfile.
+    """
+    samples, sr = sf.read(io.BytesIO(data), dtype='float32', always_2d=True)
+    samples = samples[:, 0] if samples.shape[1] == 1 else samples.mean(axis=1)
+    if sr != target_sr:
+        samples = librosa.resample(samples, orig_sr=sr, target_sr=target_sr)
+    return np.ascontiguousarray(samples, dtype=np.float32)
+
+
+class FFmpegPool:
     """
-    Конвертирует аудиофайл в формат .wav для распознавания.
-    Принимает файл (webm/ogg) и возвращает путь к временно сохранённому файлу.
+    Пул заранее запущенных процессов ffmpeg, которые читают контейнер из stdin
+    и пишут моно float32 PCM с частотой sample_rate в stdout.
+
+    Один процесс декодирует один файл, но запускается заранее в фоновом потоке,
+    поэтому запрос не ждёт порождения процесса. После fork пул заполняется заново.
     """
-    if not audio_file:
+
+    def __init__(self, sample_rate, size=FFMPEG_POOL_SIZE, binary=FFMPEG_BINARY, timeout=FFMPEG_TIMEOUT):
+        self.sample_rate = sample_rate
+        self.size = size
+        self.binary = binary
+        self.timeout = timeout
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._replenishing = False
+        self._pid = None
+
+    def _command(self):
+        return [
+            self.binary, '-hide_banner', '-loglevel', 'error',
+            '-i', 'pipe:0',
+            '-f', 'f32le', '-acodec', 'pcm_f32le', '-ac', '1', '-ar', str(self.sample_rate),
+            'pipe:1'
+        ]
+
+    def _spawn(self):
+        return subprocess.Popen(
+            self._command(), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+
+    def _check_fork(self):
+        # Вызывается под self._lock. Процессы родителя после fork не используются;
+        # копии их каналов закрываются, иначе ffmpeg родителя не получит конец входных данных
+        if self._pid != os.getpid():
+            for process in self._idle:
+                for stream in (process.stdin, process.stdout, process.stderr):
+                    stream.close()
+            self._idle = deque()
+            self._replenishing = False
+            self._pid = os.getpid()
+
+    def _replenish(self):
+        try:
+            while True:
+                with self._lock:
+                    if len(self._idle) >= self.size or self._pid != os.getpid():
+                        return
+                process = self._spawn()
+                with self._lock:
+                    self._idle.append(process)
+        except OSError:
+            # ffmpeg недоступен — ошибка будет выдана при декодировании
+            pass
+        finally:
+            with self._lock:
+                self._replenishing = False
+
+    def _start_replenish(self):
+        with self._lock:
+            if self._replenishing or len(self._idle) >= self.size:
+                return
+            self._replenishing = True
+        threading.Thread(target=self._replenish, name='ffmpeg-pool', daemon=True).start()
+
+    def _acquire(self):
+        with self._lock:
+            self._check_fork()
+            process = None
+            while self._idle:
+                candidate = self._idle.popleft()
+                if candidate.poll() is None:
+                    process = candidate
+                    break
+        self._start_replenish()
+        return process or self._spawn()
+
+    def warm_up(self):
+        """
+        Запускает процессы пула заранее (например, при старте приложения).
+        """
+        with self._lock:
+            self._check_fork()
+        self._start_replenish()
+
+    def decode(self, data):
+        try:
+            process = self._acquire()
+        except OSError as e:
+            raise ValueError(f"Не удалось запустить ffmpeg: {e}")
+        try:
+            stdout, stderr = process.communicate(data, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise ValueError("Декодирование аудио превысило тайм-аут.")
+        if process.returncode != 0:
+            raise ValueError(f"Не удалось декодировать аудио: {stderr.decode(errors='replace').strip()}")
+        return np.frombuffer(stdout, dtype='<f4').copy()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for process in idle:
+            process.kill()
+
+
+_ffmpeg_pools = {}
+_ffmpeg_pools_lock = threading.Lock()
+
+
+def get_ffmpeg_pool(sample_rate):
+    with _ffmpeg_pools_lock:
+        if sample_rate not in _ffmpeg_pools:
+            _ffmpeg_pools[sample_rate] = FFmpegPool(sample_rate)
+        return _ffmpeg_pools[sample_rate]
+
+
+def read_audio_data(audio_file):
+    """
+    Байты аудио из пути, bytes или файлового объекта (в том числе FileStorage).
+    """
+    if isinstance(audio_file, (bytes, bytearray, memoryview)):
+        return bytes(audio_file)
+    if isinstance(audio_file, (str, os.PathLike)):
+        with open(audio_file, 'rb') as f:
+            return f.read()
+    return audio_file.read()
+
+
+@timed('decode')
+def decode_audio(audio_file, target_sr=16000):
+    """
+    Декодирует аудиофайл в память без записи на диск. Формат определяется по сигнатуре:
+    WAV PCM16 нужной частоты читается напрямую, WAV/FLAC/OGG — через libsndfile,
+    webm/opus, mp3 и прочее — через пул процессов ffmpeg.
+    Возвращает моно-сигнал float32 в диапазоне [-1, 1] с частотой target_sr.
+    """
+    if audio_file is None or (isinstance(audio_file, str) and not audio_file):
         raise ValueError("Аудиофайл не выбран.")
 
-    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_out:
-        audio = AudioSegment.from_file(audio_file, format="webm")
-        audio = audio.set_channels(1).set_frame_rate(16000)
-        audio.export(tmp_out.name, format="wav")
-        return tmp_out.name
+    data = read_audio_data(audio_file)
+    if not data:
+        raise ValueError("Аудиофайл пуст.")
+
+    audio_format = sniff_format(data)
+
+    if audio_format == 'wav':
+        samples = read_pcm16_wav(data, target_sr)
+        if samples is not None:
+            AUDIO_DECODED.inc(format=audio_format, decoder='pcm16')
+            return samples
+
+    if audio_format in SOUNDFILE_FORMATS:
+        try:
+            samples = read_soundfile(data, target_sr)
+            AUDIO_DECODED.inc(format=audio_format, decoder='soundfile')
+            return samples
+        except RuntimeError:
+            # Например, Opus в OGG при старой версии libsndfile
+            pass
+
+    samples = get_ffmpeg_pool(target_sr).decode(data)
+    AUDIO_DECODED.inc(format=audio_format or 'unknown', decoder='ffmpeg')
+    return samples
@@ -0,0 +1,114 @@
+# app/weights.py
+# Веса моделей в формате safetensors, отображаемые в память: все процессы узла
+# используют одну копию весов в страничном кэше ОС
+
+import json
+import os
+import numpy as np
+from app.lazy import lazy_import
+
+torch = lazy_import('torch')
+transformers = lazy_import('transformers')
+
+# Загрузка весов через отображение файла в память (0 — обычный from_pretrained)
+MMAP_WEIGHTS = os.environ.get('MMAP_WEIGHTS', '1') == '1'
+MMAP_WEIGHTS_DIR = os.environ.get('MMAP_WEIGHTS_DIR', "./models/safetensors")
+
+# Типы safetensors → NumPy (bfloat16 читается как int16 и переинтерпретируется в torch)
+SAFETENSORS_DTYPES = {
+    'F64': np.float64, 'F32': np.float32, 'F16': np.float16, 'BF16': np.int16,
+    'I64': np.int64, 'I32': np.int32, 'I16': np.int16, 'I8': np.int8, 'U8': np.uint8, 'BOOL': np.bool_,
+}
+
+
+def weights_path(model_id):
+    return os.path.join(MMAP_WEIGHTS_DIR, model_id.replace("/", "__") + ".safetensors")
+
+
+def export_weights(model, path):
+    """
+    Сохраняет параметры и буферы модели (включая непостоянные, которых нет в state_dict).
+    Запись атомарная: другие процессы не увидят недописанный файл.
+    """
+    from safetensors.torch import save_file
+
+    tensors = {name: tensor.detach().contiguous() for name, tensor in model.named_parameters()}
+    tensors.update({name: tensor.detach().contiguous() for name, tensor in model.named_buffers()})
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    save_file(tensors, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def mmap_tensors(path):
+    """
+    Отображает файл safetensors в память и возвращает тензоры без копирования.
+    Режим 'c' (MAP_PRIVATE): страницы общие для всех процессов, пока их никто не изменяет.
+    """
+    with open(path, 'rb') as f:
+        header_size = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(header_size))
+    header.pop('__metadata__', None)
+
+    buffer = np.memmap(path, dtype=np.uint8, mode='c')
+    data_start = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        start, end = info['data_offsets']
+        array = buffer[data_start + start:data_start + end].view(SAFETENSORS_DTYPES[info['dtype']])
+        tensor = torch.from_numpy(array.reshape(info['shape']))
+        if info['dtype'] == 'BF16':
+            tensor = tensor.view(torch.bfloat16)
+        tensors[name] = tensor
+    return tensors
+
+
+def _assign(model, name, tensor):
+    module_name, _, attr = name.rpartition('.')
+    module = model.get_submodule(module_name)
+    if attr in module._parameters:
+        module._parameters[attr] = torch.nn.Parameter(tensor, requires_grad=False)
+    else:
+        module._buffers[attr] = tensor
+
+
+def load_mmap_model(model_class, model_id, cache_dir=None):
+    """
+    Загружает модель transformers с весами, отображёнными в память.
+    При первом вызове веса экспортируются из from_pretrained в MMAP_WEIGHTS_DIR;
+    затем модель создаётся на устройстве meta (без выделения памяти под веса)
+    и получает тензоры из файла.
+    """
+    path = weights_path(model_id)
+    if not os.path.exists(path):
+        print(f"⏳ Экспортируем веса {model_id} в {path}")
+        export_weights(model_class.from_pretrained(model_id, cache_dir=cache_dir), path)
+
+    from transformers.modeling_utils import no_init_weights
+
+    config = transformers.AutoConfig.from_pretrained(model_id, cache_dir=cache_dir)
+    with no_init_weights(), torch.device('meta'):
+        model = model_class(config)
+
+    for name, tensor in mmap_tensors(path).items():
+        _assign(model, name, tensor)
+    model.tie_weights()
+
+    missing = [name for name, tensor in [*model.named_parameters(), *model.named_buffers()] if tensor.is_meta]
+    if missing:
+        raise RuntimeError(f"В {path} нет весов: {', '.join(missing[:5])}")
+    return model.eval()
+
+
+def load_pretrained(model_class, model_id, cache_dir=None):
+    """
+    Загружает модель через отображение весов в память (MMAP_WEIGHTS),
+    при ошибке — обычным from_pretrained.
+    """
+    if MMAP_WEIGHTS:
+        try:
+            return load_mmap_model(model_class, model_id, cache_dir)
+        except Exception as e:
+            print(f"⚠️ Не удалось отобразить веса {model_id} в память: {e}")
+    return model_class.from_pretrained(model_id, cache_dir=cache_dir).eval()
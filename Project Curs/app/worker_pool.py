@@ -0,0 +1,163 @@
+# app/worker_pool.py
+# Пул процессов для инференса вне потоков запросов Flask
+
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from app.metrics import registry
+
+# Число процессов-воркеров (0 — обработка в пуле потоков, а при INFERENCE_TIMEOUT=0 — в потоке запроса)
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 0))
+# Максимум запросов в работе и в очереди; сверх него запросы отклоняются с 503
+INFERENCE_MAX_QUEUE_DEPTH = int(os.environ.get('INFERENCE_MAX_QUEUE_DEPTH', 16))
+# Предельное время обработки одного запроса, в секундах (0 — без ограничения)
+INFERENCE_TIMEOUT = float(os.environ.get('INFERENCE_TIMEOUT', 300))
+# Потоки, в которых выполняется инференс с тайм-аутом, если пул процессов выключен
+INFERENCE_THREADS = int(os.environ.get('INFERENCE_THREADS', 8))
+
+
+class PoolBusy(Exception):
+    """Очередь пула заполнена."""
+
+
+class InferenceTimeout(Exception):
+    """Запрос не обработан за INFERENCE_TIMEOUT."""
+
+
+def _init_worker(num_threads):
+    # Каждый воркер получает свою долю ядер, чтобы потоки torch не конкурировали между процессами
+    import app.inference as inference
+    import app.speech_recognition as speech_recognition
+    inference.ASR_NUM_THREADS = num_threads
+    # Воркер выполняет одну задачу за раз, поэтому объединять в пакеты нечего:
+    # планировщик только добавлял бы ASR_BATCH_MAX_WAIT_MS к каждому прогону
+    speech_recognition.ASR_BATCH_MAX_SIZE = 1
+
+
+class InferencePool:
+    """
+    Пул процессов, каждый из которых держит свои модели, или (при workers=0) пул потоков.
+    Число принятых и ещё не завершённых задач ограничено max_queue_depth; задача,
+    для которой истёк INFERENCE_TIMEOUT, занимает место, пока не доработает, поэтому
+    зависшие прогоны приводят к 503, а не к бесконечному росту очереди.
+    Если воркер погиб (например, убит при нехватке памяти), пул пересоздаётся.
+    Пакетирование запросов между потоками (ASR_BATCH_MAX_SIZE) в воркерах отключено.
+    """
+
+    def __init__(self, workers=INFERENCE_WORKERS, max_queue_depth=INFERENCE_MAX_QUEUE_DEPTH,
+                 threads=INFERENCE_THREADS):
+        self.workers = workers
+        self.max_queue_depth = max_queue_depth
+        self.threads = threads
+        self._executor = None
+        self._executor_pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def _get_executor(self):
+        # Создаётся в каждом процессе заново: после fork потоки и процессы родителя недоступны
+        if self._executor is not None and self._executor_pid == os.getpid():
+            return self._executor
+        self._executor_pid = os.getpid()
+        if not self.enabled:
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='inference')
+        else:
+            num_threads = max(1, (os.cpu_count() or 1) // self.workers)
+            # spawn: дочерние процессы не наследуют потоки и состояние torch родителя
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(num_threads,)
+            )
+        return self._executor
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Отправляет задачу в пул. Бросает PoolBusy, если очередь заполнена.
+        """
+        with self._lock:
+            if self._pending >= self.max_queue_depth:
+                raise PoolBusy(f"Очередь инференса заполнена ({self.max_queue_depth})")
+            self._pending += 1
+            executor = self._get_executor()
+
+        try:
+            try:
+                future = executor.submit(fn, *args, **kwargs)
+            except BrokenProcessPool:
+                # Пул сломан ранее погибшим воркером — задача ещё не начата, повторяем в новом
+                self._discard(executor)
+                with self._lock:
+                    executor = self._get_executor()
+                future = executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        future.add_done_callback(lambda done: self._check_broken(executor, done))
+        return future
+
+    def _check_broken(self, executor, future):
+        # Воркер погиб во время задачи: саму задачу не повторяем (она могла быть причиной),
+        # но следующие запросы получат новый пул
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._discard(executor)
+
+    def _discard(self, executor):
+        """
+        Убирает сломанный пул (если его ещё не заменил другой поток); новый создаётся при следующей задаче.
+        """
+        with self._lock:
+            if self._executor is not executor:
+                return
+            print("⚠️ Процесс пула инференса завершился аварийно, пул будет пересоздан")
+            self._executor = None
+        executor.shutdown(wait=False)
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    def queue_depth(self):
+        return self._pending
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+inference_pool = InferencePool()
+
+registry.callback(
+    'synchrony_inference_queue_depth', 'Requests accepted for inference and not yet finished',
+    lambda: inference_pool.queue_depth()
+)
+
+
+def run_inference(fn, *args, **kwargs):
+    """
+    Выполняет функцию конвейера в пуле процессов (если он включён) или в пуле потоков
+    и ждёт результат не дольше INFERENCE_TIMEOUT. Бросает PoolBusy, если очередь заполнена,
+    и InferenceTimeout, если срок вышел: запрос получает ответ, а начатая работа дорабатывает в фоне.
+    При INFERENCE_WORKERS=0 и INFERENCE_TIMEOUT=0 функция выполняется прямо в потоке запроса.
+    """
+    if inference_pool.enabled or INFERENCE_TIMEOUT > 0:
+        future = inference_pool.submit(fn, *args, **kwargs)
+    else:
+        return fn(*args, **kwargs)
+
+    try:
+        return future.result(timeout=INFERENCE_TIMEOUT or None)
+    except FutureTimeout:
+        # Ещё не начатая задача снимается с очереди
+        future.cancel()
+        raise InferenceTimeout(f"Запрос не обработан за {INFERENCE_TIMEOUT:g} с")
@@ -0,0 +1,254 @@
+# batch_transcribe.py
+# Пакетная обработка архива записей без HTTP: распознавание → пунктуация → перевод
+#
+# Пример:
+#   python batch_transcribe.py ./recordings --output results.jsonl --workers 4 --target-language en
+#   python batch_transcribe.py manifest.jsonl --output results.jsonl --mode local
+#
+# Манифест: текстовый файл (путь или «путь<TAB>язык» в строке) или JSONL
+# с полями path и language. Результаты дописываются в JSONL по мере готовности;
+# при повторном запуске уже обработанные файлы пропускаются.
+# Для файлов с языком auto язык сначала определяется отдельным проходом
+# (--detect-workers процессов), а затем файлы группируются по найденному языку.
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import groupby
+
+AUDIO_EXTENSIONS = ('.wav', '.flac', '.ogg', '.opus', '.webm', '.mp3', '.m4a')
+MODES = ('online', 'local', 'none')
+
+
+def scan_directory(directory, language):
+    """
+    Все аудиофайлы каталога (рекурсивно) с языком по умолчанию.
+    """
+    items = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                items.append((os.path.abspath(os.path.join(root, name)), language))
+    return sorted(items)
+
+
+def read_manifest(path, language):
+    """
+    Читает манифест. Относительные пути считаются от каталога манифеста.
+    :return: Список (абсолютный путь, язык)
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    items = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('{'):
+                entry = json.loads(line)
+                audio_path, audio_language = entry['path'], entry.get('language') or language
+            else:
+                audio_path, _, audio_language = line.partition('\t')
+                audio_language = audio_language.strip() or language
+            items.append((os.path.abspath(os.path.join(base, audio_path)), audio_language))
+    return items
+
+
+def load_done(output_path, retry_errors=False):
+    """
+    Пути, уже записанные в файл результатов. Оборванная при сбое последняя строка отрезается,
+    чтобы следующие записи не склеились с ней.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+
+    with open(output_path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+            data = data[:data.rfind(b'\n') + 1]
+
+    for line in data.decode('utf-8').splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if retry_errors and 'error' in record:
+            continue
+        done.add(record['path'])
+    return done
+
+
+def make_chunks(items, chunk_size):
+    """
+    Группирует файлы по языку и режет группы на пакеты. Пакеты одного языка идут подряд,
+    поэтому воркеры в каждый момент используют одну и ту же модель.
+    """
+    chunks = []
+    for language, group in groupby(sorted(items, key=lambda item: (item[1], item[0])), key=lambda item: item[1]):
+        paths = [path for path, _ in group]
+        for i in range(0, len(paths), chunk_size):
+            chunks.append((language, paths[i:i + chunk_size]))
+    return chunks
+
+
+def detect_chunk(paths):
+    """
+    Определяет язык каждого файла по начальному окну. Сигнал предварительно обрабатывается,
+    как в transcribe (обрезка тишины, нормализация), иначе окно попадает на тишину в начале записи.
+    Если определить не удалось, язык остаётся auto и определяется при распознавании.
+    """
+    from app.speech_recognition import detect_language, load_waveform
+
+    detected = []
+    for path in paths:
+        try:
+            language, _ = detect_language(load_waveform(path))
+        except Exception as e:
+            print(f"⚠️ {path}: не удалось определить язык: {e}", file=sys.stderr)
+            language = 'auto'
+        detected.append((path, language))
+    return detected
+
+
+def run_chunks(workers, num_threads, jobs, handle_result):
+    """
+    Выполняет задания (функция, аргументы) в пуле процессов и передаёт результаты
+    handle_result по мере готовности. В работе не больше двух заданий на воркер:
+    очередь не разрастается на весь архив.
+    """
+    from app.worker_pool import _init_worker
+
+    # spawn: дочерние процессы не наследуют потоки и состояние torch родителя
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(num_threads,)
+    ) as executor:
+        queue = iter(jobs)
+        in_flight = set()
+        while True:
+            while len(in_flight) < workers * 2:
+                job = next(queue, None)
+                if job is None:
+                    break
+                fn, *job_args = job
+                in_flight.add(executor.submit(fn, *job_args))
+            if not in_flight:
+                break
+
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                handle_result(future.result())
+
+
+def detect_languages(items, workers, chunk_size):
+    """
+    Заменяет язык auto определённым. Проход отдельный: воркерам распознавания
+    затем достаточно одной модели на пакет, а не всех моделей-кандидатов.
+    """
+    auto_paths = [path for path, language in items if language == 'auto']
+    if not auto_paths:
+        return items
+
+    print(f"🔎 Определяем язык {len(auto_paths)} файлов", file=sys.stderr)
+    detected = {}
+    jobs = [(detect_chunk, auto_paths[i:i + chunk_size]) for i in range(0, len(auto_paths), chunk_size)]
+    run_chunks(workers, max(1, (os.cpu_count() or 1) // workers), jobs, lambda result: detected.update(result))
+    return [(path, detected.get(path, language) if language == 'auto' else language) for path, language in items]
+
+
+def process_file(path, source_language, target_language, mode):
+    from app.pipeline import process_translation
+    from app.speech_recognition import transcribe
+    from app.punctuation import punctuate_text
+
+    with open(path, 'rb') as f:
+        audio = f.read()
+
+    if mode == 'none':
+        recognition = transcribe(audio, language_code=source_language)
+        return {
+            'original': punctuate_text(recognition['text'], language_code=recognition['language']),
+            'source_language': recognition['language'],
+            'segments': recognition['segments'],
+        }
+    return process_translation(audio, source_language, target_language, mode)
+
+
+def process_chunk(language, paths, target_language, mode):
+    """
+    Обрабатывает пакет файлов в процессе-воркере. Ошибка одного файла не прерывает пакет.
+    """
+    records = []
+    for path in paths:
+        started = time.perf_counter()
+        try:
+            record = dict(path=path, **process_file(path, language, target_language, mode))
+        except Exception as e:
+            record = {'path': path, 'error': str(e)}
+        record['elapsed_s'] = round(time.perf_counter() - started, 3)
+        records.append(record)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетное распознавание и перевод аудиозаписей")
+    parser.add_argument('input', help="Каталог с записями или файл-манифест")
+    parser.add_argument('--output', required=True, help="Файл результатов JSONL (дописывается)")
+    parser.add_argument('--source-language', default='auto', help="Язык записей по умолчанию (auto — определить)")
+    parser.add_argument('--target-language', default='en')
+    parser.add_argument('--mode', choices=MODES, default='local', help="Режим перевода (none — без перевода)")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) // 4))
+    parser.add_argument('--detect-workers', type=int, default=1,
+                        help="Процессов для определения языка (каждый держит все модели-кандидаты)")
+    parser.add_argument('--chunk-size', type=int, default=16, help="Файлов в одном задании воркера")
+    parser.add_argument('--retry-errors', action='store_true', help="Повторить файлы, завершившиеся ошибкой")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.input):
+        items = scan_directory(args.input, args.source_language)
+    else:
+        items = read_manifest(args.input, args.source_language)
+
+    done = load_done(args.output, args.retry_errors)
+    pending = [item for item in items if item[0] not in done]
+    print(f"📂 Файлов: {len(items)}, уже обработано: {len(items) - len(pending)}, "
+          f"в очереди: {len(pending)}", file=sys.stderr)
+    if not pending:
+        return
+
+    pending = detect_languages(pending, args.detect_workers, args.chunk_size)
+    chunks = make_chunks(pending, args.chunk_size)
+    num_threads = max(1, (os.cpu_count() or 1) // args.workers)
+    started = time.perf_counter()
+    processed = errors = 0
+
+    with open(args.output, 'a', encoding='utf-8') as output:
+        def write_records(records):
+            nonlocal processed, errors
+            for record in records:
+                output.write(json.dumps(record, ensure_ascii=False) + '\n')
+                processed += 1
+                errors += 'error' in record
+            output.flush()
+
+            elapsed = time.perf_counter() - started
+            print(f"⏳ {processed}/{len(pending)} ({errors} ошибок), "
+                  f"{processed / elapsed:.2f} файлов/с", file=sys.stderr)
+
+        jobs = [(process_chunk, language, paths, args.target_language, args.mode) for language, paths in chunks]
+        run_chunks(args.workers, num_threads, jobs, write_records)
+
+    print(f"✅ Готово: {processed} файлов за {time.perf_counter() - started:.1f} с, ошибок: {errors}",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+# benchmark.py
+# Замеры производительности конвейера распознавание → пунктуация → перевод
+#
+# Пример:
+#   python benchmark.py --languages ru en --durations 2 5 30 --repeat 5 --output bench.json
+#   python benchmark.py --fixtures ./recordings --stages recognize punctuate
+#   python benchmark.py --compare-backends quantized onnx --languages ru --fixtures ./recordings --max-wer 0.05
+#   python benchmark.py --stages ctc_decode --lm ru=./models/lm/ru.arpa
+
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+STAGES = ['decode', 'preprocess', 'load', 'detect', 'recognize', 'ctc_decode', 'punctuate', 'translate_local', 'translate_online']
+
+SAMPLE_RATE = 16000
+
+# Тексты для замеров пунктуации и перевода (без знаков препинания, как после распознавания)
+SAMPLE_SENTENCES = {
+    'ru': "сегодня мы обсуждаем план работы на следующую неделю и распределяем задачи между участниками",
+    'en': "today we are discussing the work plan for next week and assigning tasks to the team members",
+    'de': "heute besprechen wir den arbeitsplan für die nächste woche und verteilen die aufgaben im team",
+    'fr': "aujourd'hui nous discutons du plan de travail pour la semaine prochaine et répartissons les tâches",
+}
+TEXT_LENGTHS = [10, 50, 200, 1000]
+
+
+def peak_rss_mb():
+    # ru_maxrss в Linux — в килобайтах, в macOS — в байтах
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def summarize(latencies, units=None):
+    """
+    Сводка по замерам: p50/p95/среднее в мс и пропускная способность.
+    :param units: Объём работы за один вызов (например, секунды аудио); по умолчанию — 1 вызов
+    """
+    latencies = np.asarray(latencies)
+    total = latencies.sum()
+    summary = {
+        'count': int(len(latencies)),
+        'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 2),
+        'p95_ms': round(float(np.percentile(latencies, 95)) * 1000, 2),
+        'mean_ms': round(float(latencies.mean()) * 1000, 2),
+        'throughput_per_s': round(len(latencies) / total, 3) if total else None,
+    }
+    if units is not None and total:
+        summary['units_per_s'] = round(units * len(latencies) / total, 3)
+    return summary
+
+
+def measure(fn, repeat, warmup=1):
+    """
+    Вызывает fn warmup + repeat раз, возвращает длительности замеренных вызовов (в секундах).
+    """
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def synthetic_speech(duration_sec, seed=0):
+    """
+    Речеподобный сигнал: гармоники основного тона с вибрато, слоговая огибающая ~4 Гц,
+    паузы между «фразами» и слабый шум.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration_sec * SAMPLE_RATE)) / SAMPLE_RATE
+    f0 = 120 + 20 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None)
+    phrases = (np.sin(2 * np.pi * 0.25 * t) > -0.6).astype(np.float32)
+    signal = voice * syllables * phrases + 0.01 * rng.standard_normal(len(t))
+    return (signal / np.abs(signal).max()).astype(np.float32)
+
+
+def load_fixtures(durations, fixtures_dir=None):
+    """
+    Синтетические фикстуры заданной длительности и записи из каталога (wav/flac/ogg/webm).
+    :return: Список (имя, сигнал 16 кГц)
+    """
+    fixtures = [(f"synthetic_{d:g}s", synthetic_speech(d, seed=i)) for i, d in enumerate(durations)]
+    if fixtures_dir:
+        from app.utils import decode_audio
+        for path in sorted(glob.glob(os.path.join(fixtures_dir, '*'))):
+            if os.path.splitext(path)[1].lower() in ('.wav', '.flac', '.ogg', '.webm', '.mp3'):
+                with open(path, 'rb') as f:
+                    fixtures.append((os.path.basename(path), decode_audio(f, target_sr=SAMPLE_RATE)))
+    return fixtures
+
+
+class StubTranslateHandler(BaseHTTPRequestHandler):
+    """
+    Заглушка сервиса онлайн-перевода: отвечает в формате translate_a/single
+    с заданной задержкой, возвращая исходный текст в верхнем регистре.
+    """
+    delay = 0.02
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        text = query.get('q', [''])[0]
+        time.sleep(self.delay)
+        body = json.dumps([[[text.upper(), text, None, None]], None, query.get('sl', ['auto'])[0]])
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body.encode())))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server(delay):
+    StubTranslateHandler.delay = delay
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubTranslateHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/translate_a/single"
+
+
+def encode_fixture(waveform, audio_format):
+    import soundfile as sf
+    buffer = io.BytesIO()
+    sf.write(buffer, waveform, SAMPLE_RATE, format=audio_format, subtype='PCM_16')
+    return buffer.getvalue()
+
+
+def bench_decode(fixtures, repeat):
+    """
+    Декодирование загрузок: WAV PCM16 16 кГц (быстрый путь) и FLAC (libsndfile).
+    """
+    from app.utils import decode_audio
+    results = {}
+    for audio_format in ('WAV', 'FLAC'):
+        for name, waveform in fixtures:
+            data = encode_fixture(waveform, audio_format)
+            latencies = measure(lambda: decode_audio(data, target_sr=SAMPLE_RATE), repeat)
+            results[f"{audio_format.lower()}/{name}"] = summarize(latencies, len(waveform) / SAMPLE_RATE)
+    return results
+
+
+def noisy(waveform, snr_db=10, seed=0):
+    # Белый шум с заданным отношением сигнал/шум (как запись из шумного помещения)
+    rng = np.random.default_rng(seed)
+    noise = rng.standard_normal(len(waveform)).astype(np.float32)
+    noise *= np.sqrt(np.mean(waveform ** 2) / 10 ** (snr_db / 10))
+    return waveform + noise
+
+
+def bench_preprocess(fixtures, repeat):
+    """
+    Предобработка сигнала: обрезка и нормализация, фильтр верхних частот,
+    шумоподавление и пакетная обработка всех фикстур.
+    Сигнал обрабатывается на месте, поэтому каждый вызов получает копию.
+    """
+    from app.audio_processing import enhance_audio, enhance_audio_batch
+    variants = {
+        'default': {'highpass_hz': 0, 'noise_suppression': False},
+        'highpass': {'highpass_hz': 80, 'noise_suppression': False},
+        'denoise': {'highpass_hz': 80, 'noise_suppression': True},
+    }
+    results = {}
+    for variant, options in variants.items():
+        for name, waveform in fixtures:
+            waveform = noisy(waveform)
+            latencies = measure(lambda: enhance_audio(waveform.copy(), SAMPLE_RATE, **options), repeat)
+            results[f"{variant}/{name}"] = summarize(latencies, len(waveform) / SAMPLE_RATE)
+        waveforms = [noisy(waveform) for _, waveform in fixtures]
+        results[f"{variant}/batch_{len(waveforms)}"] = summarize(
+            measure(lambda: enhance_audio_batch([w.copy() for w in waveforms], SAMPLE_RATE, **options), repeat),
+            sum(len(w) for w in waveforms) / SAMPLE_RATE
+        )
+    return results
+
+
+def bench_load(languages):
+    from app.speech_recognition import load_model_for_language
+    results = {}
+    for lang in languages:
+        started = time.perf_counter()
+        load_model_for_language(lang)
+        results[lang] = {'load_s': round(time.perf_counter() - started, 3)}
+    return results
+
+
+def bench_detect(fixtures, repeat):
+    from app.speech_recognition import detect_language
+    return {
+        name: summarize(measure(lambda: detect_language(waveform, SAMPLE_RATE), repeat), len(waveform) / SAMPLE_RATE)
+        for name, waveform in fixtures
+    }
+
+
+def bench_recognize(fixtures, languages, repeat):
+    import app.speech_recognition as speech_recognition
+
+    # Кэш отключается, иначе замеряются только попадания в него
+    cache, speech_recognition.transcript_cache = speech_recognition.transcript_cache, None
+    try:
+        results = {}
+        for lang in languages:
+            for name, waveform in fixtures:
+                latencies = measure(lambda: speech_recognition.transcribe(waveform, language_code=lang), repeat)
+                results[f"{lang}/{name}"] = summarize(latencies, len(waveform) / SAMPLE_RATE)
+        return results
+    finally:
+        speech_recognition.transcript_cache = cache
+
+
+def bench_ctc_decode(fixtures, languages, repeat, lm_paths):
+    """
+    Жадное декодирование против лучевого поиска (с языковой моделью, если задана):
+    задержка, доля от времени прямого прохода и расхождение текстов (WER относительно жадного).
+    """
+    from app.speech_recognition import load_model_for_language, compute_logits, decode_logits
+    from app.ctc_decoder import build_decoder
+    from app.accent_config import get_accent_config
+    from app.inference import word_error_rate
+
+    results = {}
+    for lang in languages:
+        model_data = load_model_for_language(lang)
+        config = dict(get_accent_config(lang), decoder='beam', lm_path=lm_paths.get(lang))
+        decoder = build_decoder(model_data['processor'], config)
+        for name, waveform in fixtures:
+            forward = summarize(measure(lambda: compute_logits(model_data, waveform), repeat))
+            logits = compute_logits(model_data, waveform)
+            greedy_text = decode_logits(model_data['processor'], logits)
+            matrix = logits[0].numpy()
+            beam_text = decoder.decode(matrix)
+            for label, fn in (('greedy', lambda: decode_logits(model_data['processor'], logits)),
+                              ('beam', lambda: decoder.decode(matrix))):
+                summary = summarize(measure(fn, repeat), len(waveform) / SAMPLE_RATE)
+                summary['fraction_of_forward'] = round(summary['p50_ms'] / forward['p50_ms'], 4)
+                results[f"{lang}/{name}/{label}"] = summary
+            results[f"{lang}/{name}/beam"]['wer_vs_greedy'] = round(word_error_rate(greedy_text, beam_text), 4)
+        segments = [compute_logits(model_data, waveform)[0].numpy() for _, waveform in fixtures]
+        results[f"{lang}/beam_batch_{len(segments)}"] = summarize(
+            measure(lambda: decoder.decode_batch(segments), repeat),
+            sum(len(waveform) for _, waveform in fixtures) / SAMPLE_RATE
+        )
+    return results
+
+
+def sample_texts(language):
+    words = SAMPLE_SENTENCES.get(language, SAMPLE_SENTENCES['en']).split()
+    return {n: ' '.join(words[i % len(words)] for i in range(n)) for n in TEXT_LENGTHS}
+
+
+def bench_punctuate(languages, repeat):
+    from app.punctuation import punctuate_text, punctuate_texts
+    results = {}
+    for lang in languages:
+        texts = sample_texts(lang)
+        for n, text in texts.items():
+            results[f"{lang}/{n}_words"] = summarize(measure(lambda: punctuate_text(text, lang), repeat), n)
+        batch = list(texts.values())
+        results[f"{lang}/batch_{len(batch)}"] = summarize(
+            measure(lambda: punctuate_texts(batch, lang), repeat), sum(TEXT_LENGTHS)
+        )
+    return results
+
+
+def bench_translate(mode, repeat, target_language='en'):
+    import app.translation as translation
+    from app.punctuation import punctuate_text
+
+    # Кэш отключается, иначе замеряются только попадания в него
+    cache, translation.translation_cache = translation.translation_cache, None
+    try:
+        results = {}
+        for n, text in sample_texts('ru').items():
+            text = punctuate_text(text, 'ru')
+            results[f"ru-{target_language}/{n}_words"] = summarize(
+                measure(lambda: translation.translate_text(text, target_language, mode), repeat), n
+            )
+        return results
+    finally:
+        translation.translation_cache = cache
+
+
+def bench_online(repeat, stub_delay):
+    import app.translation as translation
+    from app.online_translation import OnlineTranslationClient
+
+    server, url = start_stub_server(stub_delay)
+    client, translation.online_client = translation.online_client, OnlineTranslationClient(base_url=url)
+    try:
+        return bench_translate('online', repeat)
+    finally:
+        translation.online_client = client
+        server.shutdown()
+
+
+def compare_backends(fixtures, languages, backends):
+    """
+    Сравнивает движки инференса с eager fp32: задержка прямого прохода и WER относительно eager.
+    """
+    from app.speech_recognition import load_model_for_language, compute_logits, decode_logits
+    from app.accent_config import get_accent_config
+    from app.inference import build_inference_model, word_error_rate
+
+    results = {}
+    for lang in languages:
+        reference = load_model_for_language(lang)
+        reference_texts = {
+            name: decode_logits(reference['processor'], compute_logits(reference, waveform))
+            for name, waveform in fixtures
+        }
+        for backend in ['eager'] + list(backends):
+            if backend == 'eager':
+                model_data = reference
+            else:
+                model, _ = build_inference_model(reference['model'], backend, get_accent_config(lang)['model_id'])
+                model_data = dict(reference, model=model)
+            latencies = []
+            wers = []
+            for name, waveform in fixtures:
+                latencies += measure(lambda: compute_logits(model_data, waveform), 1)
+                text = decode_logits(model_data['processor'], compute_logits(model_data, waveform))
+                wers.append(word_error_rate(reference_texts[name], text))
+            results[f"{lang}/{backend}"] = dict(summarize(latencies), wer_vs_eager=round(float(np.mean(wers)), 4))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности SynchronyTranslate")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--languages', nargs='+', default=['ru'])
+    parser.add_argument('--durations', nargs='+', type=float, default=[2, 5, 15])
+    parser.add_argument('--fixtures', help="Каталог с записями для замеров")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--stub-delay', type=float, default=0.02, help="Задержка заглушки онлайн-перевода, с")
+    parser.add_argument('--compare-backends', nargs='*', default=None,
+                        help="Сравнить движки инференса (quantized, torchscript, onnx) с eager")
+    parser.add_argument('--max-wer', type=float, default=0.05,
+                        help="Допустимый WER движка относительно eager; при превышении код возврата 1")
+    parser.add_argument('--lm', nargs='*', default=[], metavar='LANG=PATH',
+                        help="Языковые модели ARPA для замеров лучевого поиска")
+    parser.add_argument('--output', help="Файл для результатов в JSON")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.durations, args.fixtures)
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'args': vars(args),
+        'fixtures': {name: round(len(waveform) / SAMPLE_RATE, 2) for name, waveform in fixtures},
+        'results': {},
+    }
+
+    runners = {
+        'decode': lambda: bench_decode(fixtures, args.repeat),
+        'preprocess': lambda: bench_preprocess(fixtures, args.repeat),
+        'load': lambda: bench_load(args.languages),
+        'detect': lambda: bench_detect(fixtures, args.repeat),
+        'recognize': lambda: bench_recognize(fixtures, args.languages, args.repeat),
+        'ctc_decode': lambda: bench_ctc_decode(
+            fixtures, args.languages, args.repeat, dict(item.split('=', 1) for item in args.lm)
+        ),
+        'punctuate': lambda: bench_punctuate(args.languages, args.repeat),
+        'translate_local': lambda: bench_translate('local', args.repeat),
+        'translate_online': lambda: bench_online(args.repeat, args.stub_delay),
+    }
+
+    started = time.perf_counter()
+    report['peak_rss_mb_after'] = {}
+    for stage in [stage for stage in STAGES if stage in args.stages]:
+        print(f"⏱ {stage}...", file=sys.stderr)
+        report['results'][stage] = runners[stage]()
+        report['peak_rss_mb_after'][stage] = round(peak_rss_mb(), 1)
+    if args.compare_backends is not None:
+        report['results']['backends'] = compare_backends(
+            fixtures, args.languages, args.compare_backends or ['quantized', 'torchscript', 'onnx']
+        )
+
+    report['total_s'] = round(time.perf_counter() - started, 2)
+    report['peak_rss_mb'] = round(peak_rss_mb(), 1)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+
+    # Проверка точности: транскрипты движков не должны расходиться с eager fp32 сильнее допуска
+    failed = [
+        f"{name}: WER {result['wer_vs_eager']} > {args.max_wer}"
+        for name, result in report['results'].get('backends', {}).items()
+        if result['wer_vs_eager'] > args.max_wer
+    ]
+    if failed:
+        print("❌ Превышен допуск WER:\n" + "\n".join(failed), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# serve.py
+# Запуск приложения в рабочем режиме через gunicorn
+#
+# Модели загружаются один раз в мастер-процессе (preload_app), после чего воркеры
+# порождаются через fork и разделяют веса с мастером (copy-on-write).
+#
+# Пример:
+#   python serve.py --bind 0.0.0.0:5000 --workers 4 --threads 8 --request-timeout 120
+#
+# Срок обработки запроса (--request-timeout, INFERENCE_TIMEOUT) соблюдается приложением:
+# по его истечении клиент получает 504. --timeout gunicorn с воркерами gthread
+# не ограничивает запросы — это срок ответа воркера на проверку живости мастера.
+#
+# Метрики /metrics хранятся в памяти воркера: при --workers > 1 каждый опрос
+# возвращает счётчики того воркера, которому достался запрос.
+
+import argparse
+import gc
+import os
+
+from gunicorn.app.base import BaseApplication
+
+# Прогрев (импорт библиотек и загрузка моделей) выполняется в мастере до fork.
+# По умолчанию загружаются модели распознавания всех языков, иначе каждый воркер
+# загрузил бы свою копию при первом запросе
+os.environ.setdefault('WARM_UP', '1')
+os.environ.setdefault('PRELOAD_LANGUAGES', 'all')
+
+WEB_BIND = os.environ.get('WEB_BIND', '0.0.0.0:5000')
+WEB_WORKERS = int(os.environ.get('WEB_WORKERS', 2))
+WEB_THREADS = int(os.environ.get('WEB_THREADS', 4))
+# Через сколько секунд без признаков жизни мастер перезапускает воркер (не срок запроса)
+WEB_TIMEOUT = int(os.environ.get('WEB_TIMEOUT', 300))
+# Сколько ждать завершения текущих запросов при остановке, в секундах
+WEB_GRACEFUL_TIMEOUT = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 60))
+# Перезапуск воркера после N запросов (0 — без перезапуска); новый воркер снова fork-ается от мастера
+WEB_MAX_REQUESTS = int(os.environ.get('WEB_MAX_REQUESTS', 0))
+
+
+def create_production_app():
+    from app import create_app
+
+    template_dir = os.path.join(os.path.dirname(__file__), "app", "templates")
+    static_dir = os.path.join(os.path.dirname(__file__), "static")
+    app = create_app(template_folder=template_dir, static_folder=static_dir)
+
+    # Объекты, созданные при загрузке моделей, переносятся в постоянное поколение:
+    # сборщик мусора в воркерах не трогает их заголовки и не копирует страницы памяти мастера
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+def post_fork(server, worker):
+    # Потоки torch делятся между воркерами, чтобы они не конкурировали за ядра
+    from app.inference import ASR_NUM_THREADS, torch
+    num_threads = ASR_NUM_THREADS or max(1, (os.cpu_count() or 1) // server.cfg.workers)
+    torch.set_num_threads(num_threads)
+
+
+class ProductionServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return create_production_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SynchronyTranslate: рабочий сервер (gunicorn)")
+    parser.add_argument('--bind', default=WEB_BIND)
+    parser.add_argument('--workers', type=int, default=WEB_WORKERS)
+    parser.add_argument('--threads', type=int, default=WEB_THREADS, help="Потоков на воркер")
+    parser.add_argument('--timeout', type=int, default=WEB_TIMEOUT, help="Тайм-аут живости воркера, с")
+    parser.add_argument('--request-timeout', type=float, default=None,
+                        help="Предельное время обработки запроса, с (по умолчанию INFERENCE_TIMEOUT)")
+    parser.add_argument('--graceful-timeout', type=int, default=WEB_GRACEFUL_TIMEOUT)
+    parser.add_argument('--max-requests', type=int, default=WEB_MAX_REQUESTS)
+    args = parser.parse_args()
+
+    if args.request_timeout is not None:
+        # Читается app.worker_pool при импорте в create_app, то есть после разбора аргументов
+        os.environ['INFERENCE_TIMEOUT'] = str(args.request_timeout)
+
+    ProductionServer({
+        'bind': args.bind,
+        'workers': args.workers,
+        # gthread: потоки внутри воркера, нужны также для WebSocket /stream
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'preload_app': True,
+        'post_fork': post_fork,
+        'accesslog': '-',
+    }).run()
+
+
+if __name__ == "__main__":
+    main()
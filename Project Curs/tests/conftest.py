@@ -0,0 +1,43 @@
+# tests/conftest.py
+# Общие фикстуры тестов. Тесты с моделями пропускаются, если нет torch/transformers
+# или модель не скачана в MODEL_CACHE_DIR (тесты не обращаются к сети).
+
+import glob
+import os
+import sys
+
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+# Короткие записи речи для проверок точности: tests/fixtures/<язык>/*.wav
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_model_or_skip(language_code):
+    """
+    Загружает модель языка только из локального кэша; иначе тест пропускается.
+    """
+    pytest.importorskip('torch')
+    transformers = pytest.importorskip('transformers')
+    from app.accent_config import get_accent_config
+    from app.speech_recognition import MODEL_CACHE_DIR, load_model_for_language
+
+    model_id = get_accent_config(language_code)['model_id']
+    try:
+        transformers.Wav2Vec2Processor.from_pretrained(model_id, cache_dir=MODEL_CACHE_DIR, local_files_only=True)
+        transformers.Wav2Vec2ForCTC.from_pretrained(model_id, cache_dir=MODEL_CACHE_DIR, local_files_only=True)
+    except OSError:
+        pytest.skip(f"Модель {model_id} не найдена в {MODEL_CACHE_DIR}")
+    return load_model_for_language(language_code)
+
+
+def speech_fixtures_or_skip(language_code):
+    """
+    Пути к записям речи языка; если их нет, тест пропускается.
+    """
+    paths = sorted(glob.glob(os.path.join(FIXTURES_DIR, language_code, '*.wav')))
+    if not paths:
+        pytest.skip(f"Нет записей в {os.path.join(FIXTURES_DIR, language_code)}")
+    return paths
@@ -0,0 +1,37 @@
+# tests/test_audio_processing.py
+
+import numpy as np
+import pytest
+
+from app.audio_processing import (
+    detect_voice_activity, VAD_REASON_EMPTY, VAD_REASON_NO_SPEECH, VAD_REASON_SILENCE, VAD_REASON_TOO_SHORT
+)
+
+SAMPLE_RATE = 16000
+
+
+def speech_like(peak_db, duration=1.0):
+    # Гармоники основного тона 150 Гц с огибающей слогов 4 Гц
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    tone = sum(np.sin(2 * np.pi * 150 * k * t) / k for k in range(1, 6))
+    waveform = tone * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t))
+    return (waveform / np.abs(waveform).max() * 10 ** (peak_db / 20)).astype(np.float32)
+
+
+@pytest.mark.parametrize('peak_db', [-3, -30, -50])
+def test_speech_is_detected_regardless_of_gain(peak_db):
+    assert detect_voice_activity(speech_like(peak_db), SAMPLE_RATE) is None
+
+
+def test_digital_silence_is_rejected():
+    assert detect_voice_activity(np.zeros(SAMPLE_RATE, dtype=np.float32), SAMPLE_RATE) == VAD_REASON_SILENCE
+
+
+def test_white_noise_is_not_speech():
+    noise = np.random.default_rng(0).normal(0, 0.01, SAMPLE_RATE).astype(np.float32)
+    assert detect_voice_activity(noise, SAMPLE_RATE) == VAD_REASON_NO_SPEECH
+
+
+def test_empty_and_short_recordings():
+    assert detect_voice_activity(np.zeros(0, dtype=np.float32), SAMPLE_RATE) == VAD_REASON_EMPTY
+    assert detect_voice_activity(speech_like(-3, duration=0.1), SAMPLE_RATE) == VAD_REASON_TOO_SHORT
@@ -0,0 +1,59 @@
+# tests/test_batching.py
+
+
+import numpy as np
+import pytest
+
+from app.batching import BatchScheduler
+from conftest import load_model_or_skip
+
+
+def test_scheduler_combines_concurrent_items():
+    sizes = []
+
+    def process(items):
+        sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    scheduler = BatchScheduler(process, max_batch_size=4, max_wait_ms=200)
+    futures = [scheduler.submit(i) for i in range(4)]
+    assert [future.result(timeout=2) for future in futures] == [0, 2, 4, 6]
+    assert sizes == [4]
+
+
+def test_scheduler_fails_all_futures_on_short_result():
+    scheduler = BatchScheduler(lambda items: items[:-1], max_batch_size=3, max_wait_ms=200)
+    futures = [scheduler.submit(i) for i in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=2)
+
+
+def test_scheduler_propagates_exceptions():
+    def process(items):
+        raise ValueError("boom")
+
+    scheduler = BatchScheduler(process, max_wait_ms=1)
+    with pytest.raises(ValueError):
+        scheduler.submit(1).result(timeout=2)
+
+
+@pytest.mark.parametrize('language_code', ['ru', 'en'])
+def test_batched_logits_match_unbatched(language_code):
+    """
+    Короткий сигнал, дополненный рядом с длинным, даёт те же логиты, что и отдельно.
+    Модели без маски внимания в пакеты не объединяются.
+    """
+    from app.speech_recognition import compute_logits, compute_logits_batch
+
+    model_data = load_model_or_skip(language_code)
+    rng = np.random.default_rng(0)
+    t = np.arange(16000 * 3) / 16000
+    long_clip = (0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * rng.standard_normal(len(t))).astype(np.float32)
+    short_clip = long_clip[:16000].copy()
+
+    batched = compute_logits_batch(model_data, [long_clip, short_clip])
+    for clip, logits in zip([long_clip, short_clip], batched):
+        single = compute_logits(model_data, clip)
+        assert logits.shape == single.shape
+        np.testing.assert_allclose(logits.numpy(), single.numpy(), atol=1e-3)
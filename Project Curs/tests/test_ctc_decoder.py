@@ -0,0 +1,119 @@
+# tests/test_ctc_decoder.py
+
+import math
+
+import numpy as np
+import pytest
+
+from app.ctc_decoder import CTCBeamDecoder, NGramLanguageModel, UNK_LOG10_PROB
+
+# Словарь в духе wav2vec2: пустой символ, разделитель слов и буквы
+VOCABULARY = ['<pad>', '|', 'a', 'b', 'l']
+BLANK, DELIMITER = 0, 1
+
+ARPA = """\\data\\
+ngram 1=5
+ngram 2=2
+
+\\1-grams:
+-1.0\t<s>\t-0.5
+-1.5\tHELLO\t-0.3
+-2.0\tworld\t-0.2
+-3.0\t<unk>
+-1.2\t</s>
+
+\\2-grams:
+-0.4\t<s> hello
+-0.7\thello world
+
+\\end\\
+"""
+
+
+def peaked_logits(tokens, peak=10.0):
+    # Каждый кадр почти однозначно выбирает свой символ
+    logits = np.zeros((len(tokens), len(VOCABULARY)), dtype=np.float32)
+    logits[np.arange(len(tokens)), tokens] = peak
+    return logits
+
+
+def greedy_decode(logits):
+    best = np.argmax(logits, axis=-1)
+    collapsed = [int(token) for i, token in enumerate(best) if i == 0 or token != best[i - 1]]
+    text = ''.join(' ' if token == DELIMITER else VOCABULARY[token] for token in collapsed if token != BLANK)
+    return ' '.join(text.split())
+
+
+def make_decoder(**kwargs):
+    return CTCBeamDecoder(VOCABULARY, BLANK, DELIMITER, **kwargs)
+
+
+@pytest.fixture
+def language_model(tmp_path):
+    path = tmp_path / 'tiny.arpa'
+    path.write_text(ARPA, encoding='utf-8')
+    return NGramLanguageModel.from_arpa(str(path))
+
+
+@pytest.mark.parametrize('tokens', [
+    [2, 0, 3, 1, 4, 4, 2],
+    [0, 0, 2, 2, 0, 0, 1, 3, 0],
+    [4, 1, 1, 2, 3, 0, 0],
+])
+def test_beam_matches_greedy_on_peaked_logits(tokens):
+    logits = peaked_logits(tokens)
+    assert make_decoder().decode(logits) == greedy_decode(logits)
+
+
+def test_repeated_character_collapses_without_blank():
+    assert make_decoder().decode(peaked_logits([4, 4])) == 'l'
+
+
+def test_blank_separates_repeated_characters():
+    assert make_decoder().decode(peaked_logits([4, 0, 4])) == 'll'
+
+
+def test_empty_logits_give_empty_text():
+    assert make_decoder().decode(np.zeros((0, len(VOCABULARY)), dtype=np.float32)) == ''
+
+
+def test_language_model_reads_order_and_lowercases(language_model):
+    assert language_model.order == 2
+    assert ('hello',) in language_model.ngrams
+    assert ('HELLO',) not in language_model.ngrams
+
+
+def test_language_model_direct_bigram(language_model):
+    assert language_model.score(('hello',), 'world') == pytest.approx(-0.7 * math.log(10))
+
+
+def test_language_model_backs_off_to_unigram(language_model):
+    # P(hello | world) нет в модели: вес отката контекста world плюс униграмма hello
+    assert language_model.score(('world',), 'hello') == pytest.approx((-0.2 - 1.5) * math.log(10))
+
+
+def test_language_model_unknown_word_uses_unk(language_model):
+    assert language_model.score(('hello',), 'missing') == pytest.approx((-0.3 - 3.0) * math.log(10))
+
+
+def test_language_model_without_unk_uses_default():
+    lm = NGramLanguageModel({('hello',): (-1.5, 0.0)}, 1)
+    assert lm.score((), 'missing') == pytest.approx(UNK_LOG10_PROB * math.log(10))
+
+
+def test_trim_context_keeps_order_minus_one_words(language_model):
+    assert language_model.trim_context(()) == ()
+    assert language_model.trim_context(('a',)) == ('a',)
+    assert language_model.trim_context(('a', 'b', 'c')) == ('c',)
+    assert NGramLanguageModel({}, 1).trim_context(('a', 'b')) == ()
+
+
+def test_language_model_rescores_ambiguous_word(language_model):
+    # Во втором кадре 'e' и 'x' равновероятны: языковая модель выбирает известное слово
+    vocabulary = ['<pad>', '|', 'h', 'e', 'l', 'o', 'x']
+    logits = np.full((6, len(vocabulary)), -10.0, dtype=np.float32)
+    for frame, token in enumerate([2, 3, 4, 0, 4, 5]):
+        logits[frame, token] = 5.0
+    logits[1, 6] = 5.0
+    decoder = CTCBeamDecoder(vocabulary, BLANK, DELIMITER, lm=language_model, alpha=1.0, beta=0.0)
+    assert decoder.decode(logits) == 'hello'
@@ -0,0 +1,54 @@
+# tests/test_inference.py
+
+import numpy as np
+import pytest
+
+from app.inference import word_error_rate, INFERENCE_BACKENDS
+from conftest import load_model_or_skip, speech_fixtures_or_skip
+
+# Допустимое среднее расхождение транскриптов движка с eager fp32
+BACKEND_WER_TOLERANCE = 0.1
+
+
+def test_word_error_rate_identical():
+    assert word_error_rate("привет мир", "Привет, мир!") == 0.0
+
+
+def test_word_error_rate_edits():
+    # Одна замена, одна вставка и одно удаление на четыре слова эталона
+    assert word_error_rate("a b c d", "a x c d e") == pytest.approx(0.5)
+    assert word_error_rate("a b c d", "a c d") == pytest.approx(0.25)
+    assert word_error_rate("a b", "") == 1.0
+
+
+def test_word_error_rate_empty_reference():
+    assert word_error_rate("", "") == 0.0
+    assert word_error_rate("", "лишнее") == 1.0
+
+
+@pytest.mark.parametrize('backend', [backend for backend in INFERENCE_BACKENDS if backend != 'eager'])
+@pytest.mark.parametrize('language_code', ['ru', 'en'])
+def test_backend_transcripts_match_eager(language_code, backend):
+    """
+    Транскрипты движка на реальных записях не расходятся с eager fp32 сильнее допуска.
+    """
+    if backend == 'onnx':
+        pytest.importorskip('onnxruntime')
+    paths = speech_fixtures_or_skip(language_code)
+    reference = load_model_or_skip(language_code)
+
+    from app.accent_config import get_accent_config
+    from app.inference import build_inference_model
+    from app.speech_recognition import compute_logits, decode_logits
+    from app.utils import decode_audio
+
+    model, _ = build_inference_model(reference['model'], backend, get_accent_config(language_code)['model_id'])
+    model_data = dict(reference, model=model)
+
+    wers = []
+    for path in paths:
+        waveform = decode_audio(path, target_sr=reference['sample_rate'])
+        expected = decode_logits(reference['processor'], compute_logits(reference, waveform))
+        actual = decode_logits(model_data['processor'], compute_logits(model_data, waveform))
+        wers.append(word_error_rate(expected, actual))
+    assert float(np.mean(wers)) <= BACKEND_WER_TOLERANCE
@@ -0,0 +1,54 @@
+# tests/test_model_registry.py
+
+from app.model_registry import ModelRegistry
+
+
+def make_registry(budget, sizes, estimator=None):
+    peaks = []
+    registry = None
+
+    def loader(key):
+        # Объём в момент загрузки: уже загруженные модели плюс новая
+        peaks.append(registry.memory_bytes() + sizes[key])
+        return key
+
+    registry = ModelRegistry(
+        loader, lambda key: sizes[key], memory_budget=budget, estimator=estimator,
+        normalize=lambda key: key if key in sizes else 'a'
+    )
+    return registry, peaks
+
+
+def test_lru_eviction_keeps_recent_models():
+    registry, _ = make_registry(250, {'a': 100, 'b': 100, 'c': 100})
+    registry.get('a')
+    registry.get('b')
+    registry.get('a')
+    registry.get('c')
+    assert registry.loaded_keys() == ['a', 'c']
+    assert registry.stats['evictions'] == 1
+
+
+def test_space_is_freed_before_loading():
+    sizes = {'a': 100, 'b': 100, 'c': 100}
+    registry, peaks = make_registry(250, sizes, estimator=sizes.get)
+    for key in 'abcab':
+        registry.get(key)
+    assert max(peaks) <= 250
+
+
+def test_unknown_size_uses_largest_known_model():
+    registry, peaks = make_registry(250, {'a': 100, 'b': 100, 'c': 100})
+    for key in 'abc':
+        registry.get(key)
+    assert max(peaks) <= 250
+
+
+def test_keys_are_normalised():
+    registry, _ = make_registry(None, {'a': 1, 'b': 1})
+    registry.preload(['a', 'xx', 'b', 'yy'])
+    assert registry.loaded_keys() == ['a', 'b']
+    assert registry.stats['loads'] == 2
+    assert 'zz' in registry
+    assert registry.evict('zz')
+    assert registry.loaded_keys() == ['b']